@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+First stage of the startup, run by cam.service.
+
+Only spidev and gpiozero are loaded before the panel is initialized and the
+last frame of the previous run, or the packed splash, is put on it, so the
+screen lights up well within a second. startup.main then loads OpenCV,
+picamera2 and the views and takes over the initialized panel without
+resetting it, the splash stays up until the first preview frame replaces it.
+
+    python3 bootstrap.py
+
+Pack a splash image with tools/packSplash.py.
+"""
+from utils.bootTrace import tracer
+from components import configLoader, lcdTransport, splash
+
+
+def showSplash(screen):
+    """Initialize the panel, show the cached frame and return the transport for startup.main"""
+    transport = lcdTransport.SpiTransport(chunkSize=screen.get('spi_chunk_size'))
+    lcdTransport.initPanel(transport)
+    paths = [screen['splash']['path']]
+    if screen['splash']['use_last_frame']:
+        paths.insert(0, screen['splash']['last_frame_path'])
+    for path in paths:
+        frame = splash.loadPacked(path, screen['width'], screen['height']) if path else None
+        if frame is not None:
+            break
+    else:
+        # The panel memory holds noise after power on
+        frame = (screen['width'], screen['height'], 0x70, bytes(screen['width'] * screen['height'] * 2))
+    splash.showPacked(transport, frame)
+    transport.backlight(True)
+    return transport
+
+
+def main():
+    screen = configLoader.ConfigLoader('./config.json')['screen']
+    transport = None
+    if screen.get('driver', 'st7789') != 'virtual':
+        with tracer.span('splash'):
+            transport = showSplash(screen)
+
+    import startup
+    startup.main(transport)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import smbus2
 import time
 from datetime import datetime
 
+from utils.bootTrace import tracer
 from . import configLoader
 
 
@@ -39,6 +40,7 @@ class BQ32002:
         'STOP_FLAG': 0x01         # Stop flag in status register
     }
 
+    @tracer.traced('BQ32002.__init__')
     def __init__(
         self,
             busNumber=configLoader.ConfigLoader()['sensor']['BQ32002']['bus'],
@@ -1,5 +1,6 @@
 import smbus2
 
+from utils.bootTrace import tracer
 from . import configLoader
 
 
@@ -25,6 +26,7 @@ class INA230:
         'MODE': 7
     }
 
+    @tracer.traced('INA230.__init__')
     def __init__(
             self,
             busNumber=configLoader.ConfigLoader()['sensor']['INA230']['bus'],
@@ -5,10 +5,12 @@ from typing import OrderedDict
 
 import smbus2
 
+from utils.bootTrace import tracer
 from . import configLoader
 
 
 class MAX17048:
+    @tracer.traced('MAX17048.__init__')
     def __init__(
         self,
         i2cBus=configLoader.ConfigLoader()['sensor']['MAX17048']['bus'],
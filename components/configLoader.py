@@ -1,5 +1,7 @@
 import json
 
+from utils.bootTrace import tracer
+
 class ConfigLoader:
     _instance = None  
     
@@ -7,7 +9,7 @@ class ConfigLoader:
         # 如果实例不存在，则创建新实例
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            with open(configPath) as f:
+            with tracer.span('ConfigLoader load'), open(configPath) as f:
                 cls._instance.__config = json.load(f)
         return cls._instance
     
@@ -1,219 +1,474 @@
-
 import logging
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy
 
-import gpiozero
-import spidev
+from components import splash
+from components.lcdTransport import SpiTransport, ST7789_INIT
+from utils import metrics
+from utils.bootTrace import tracer
 
-from components import  configLoader
+PREPARE = metrics.registry.histogram('lcd.prepare')
+TRANSFER = metrics.registry.histogram('lcd.transfer')
 
 
-class Lcd():
-    def __init__(self, width=320, height=240, spi_freq=80000000):
-        self.width, self.height = width, height
-        self.__config = configLoader.ConfigLoader('./config.json')
-
-        self.RST_PIN = gpiozero.DigitalOutputDevice(
-            self.__config['pin']['rst'],
-            active_high=True,
-            initial_value=False
-        )
-        self.DC_PIN = gpiozero.DigitalOutputDevice(
-            self.__config['pin']['dc'],
-            active_high=True,
-            initial_value=False
-        )
-        self.BL_PIN = gpiozero.DigitalOutputDevice(
-            self.__config['pin']['bl'],
-            active_high=True,
-            initial_value=False
+def calibrationCurves(profile=None):
+    """
+    Compile a calibration profile into one 256 entry curve per channel, in
+    B, G, R order like the frames. The profile is a dict with optional
+    "gamma" and "white" keys, each a number or a [r, g, b] list: the input is
+    raised to gamma and then scaled by white, 1.0 leaves a channel unchanged.
+    """
+    profile = profile or {}
+    curves = []
+    for channel in (2, 1, 0):
+        gamma, white = (
+            value[channel] if isinstance(value, (list, tuple)) else value
+            for value in (profile.get('gamma', 1.0), profile.get('white', 1.0))
         )
+        if gamma <= 0 or not 0 <= white <= 1:
+            raise ValueError("Calibration needs gamma > 0 and 0 <= white <= 1")
+        curve = numpy.linspace(0, 1, 256) ** gamma * white * 255
+        curves.append(numpy.round(curve).astype(numpy.uint8))
+    return curves
+
+
+def _packTable(shift, mask, curve):
+    """
+    Lookup table mapping one 8 bit channel to its RGB565 bits, after the
+    channel's calibration curve. The table is stored byte swapped so that
+    OR-ing the three channel lookups directly yields the big-endian words
+    expected by the panel.
+    """
+    table = curve.astype(numpy.uint16) & mask
+    table = table << shift if shift >= 0 else table >> -shift
+    return table.astype('>u2').view(numpy.uint16)
+
+
+class Lcd():
+    # MADCTL (0x36) per clockwise rotation: MY, MX and MV pick the orientation,
+    # ML keeps the refresh order the panel has always used
+    __madctl = {
+        0: 0x70,
+        90: 0xD0,
+        180: 0xB0,
+        270: 0x10
+    }
+
+    def __init__(self, width=320, height=240, spi_freq=80000000, tileSize=16, fullFrameRatio=0.5, maxRegions=8,
+                 rotation=0, transport=None, calibration=None, chunkSize=None, writerThread=True):
+        """
+        width, height: size of the panel in its unrotated, landscape orientation
+        tileSize: edge of the square tiles compared against the last frame sent
+        fullFrameRatio: fraction of changed tiles above which the whole frame is sent
+        maxRegions: number of rectangles above which they are merged into their bounding box
+        rotation: initial clockwise rotation applied by the panel, see setRotation
+        transport: object carrying commands and pixel data to the panel, see lcdTransport,
+            an SpiTransport on the board pins by default
+        calibration: gamma and white point profile folded into the packing tables, see calibrationCurves
+        chunkSize: bytes per SPI transfer of the default transport, the spidev bufsiz when None
+        writerThread: send frames from a writer thread, so packing the next frame overlaps the transfer
+        """
+        self.__panelSize = (width, height)
+        self.__rotation = rotation
+        self.width, self.height = self.__logicalSize(rotation)
+        self.__tileSize = tileSize
+        self.__fullFrameRatio = fullFrameRatio
+        self.__maxRegions = maxRegions
+
+        self.setCalibration(calibration)
+        self.__allocate()
+        self.__blank = b'\xff' * (self.width * self.height * 2)
+
+        self.__transport = transport if transport is not None else SpiTransport(spi_freq, chunkSize=chunkSize)
+        self.__frequency = getattr(self.__transport, 'frequency', None) or spi_freq
+        self.__writerThread = writerThread
+        # Created on first use by the process that shows frames, threads do not survive a fork
+        self.__writer = None
+        self.__writerPid = None
+        self.__inFlight = None
+        # Vertical scroll area in logical rows and how far its content moved up, see scroll
+        self.__scrollArea = None
+        self.__scrollOffset = 0
+        self.__sentBytes = 0
+        self.__sendTime = 0.0
+        self.__reportBytes = 0
+        self.__reportTime = 0.0
+        self.__lastReport = time.monotonic()
         self.backlight(True)
-        self.SPI = spidev.SpiDev(0, 0)
-        if self.SPI != None:
-            self.SPI.max_speed_hz = spi_freq
-            self.SPI.mode = 0b00
 
-    def backlight(self, state: bool):
-        self.__digitalWrite(self.BL_PIN, state)
+    def __logicalSize(self, rotation):
+        if rotation not in self.__madctl:
+            raise ValueError("Rotation must be one of {}".format(tuple(self.__madctl)))
+        width, height = self.__panelSize
+        return (width, height) if rotation in (0, 180) else (height, width)
 
-    def __digitalWrite(self, pin, value: bool):
-        if value:
-            pin.on()
-        else:
-            pin.off()
+    def __allocate(self):
+        """Buffers reused by every frame, sized to the logical screen"""
+        self.__resized = numpy.empty((self.height, self.width, 3), numpy.uint8)
+        self.__scratch = numpy.empty((self.height, self.width), numpy.uint16)
+        self.__buffer = numpy.empty((self.height, self.width), numpy.uint16)
+        # Content of the panel memory, valid once a full frame was sent
+        self.__lastFrame = numpy.empty((self.height, self.width), numpy.uint16)
+        self.__lastValid = False
+        self.__rowStarts = numpy.arange(0, self.height, self.__tileSize)
+        self.__columnStarts = numpy.arange(0, self.width, self.__tileSize)
 
-    def moduleExit(self):
-        logging.debug("spi end")
-        if self.SPI != None:
-            self.SPI.close()
-
-        logging.debug("gpio cleanup...")
-        self.__digitalWrite(self.RST_PIN, 1)
-        self.__digitalWrite(self.DC_PIN, 0)
-        self.BL_PIN.close()
-        time.sleep(0.001)
-
-    def __digitalWrite(self, Pin, value):
-        if value:
-            Pin.on()
+    def setCalibration(self, profile):
+        """
+        Rebuild the RGB888 >> RGB565 tables, one per channel, with the
+        calibration applied, so correcting costs nothing per frame
+        """
+        blue, green, red = calibrationCurves(profile)
+        self.__redTable = _packTable(8, 0xF8, red)
+        self.__greenTable = _packTable(3, 0xFC, green)
+        self.__blueTable = _packTable(-3, 0xF8, blue)
+        # Frames already on the panel were packed with the old tables
+        self.__lastValid = False
+
+    @property
+    def rotation(self):
+        return self.__rotation
+
+    def setRotation(self, rotation):
+        """
+        Rotate the display in hardware through MADCTL.
+        Frames are drawn upright in a logical screen of width x height,
+        which is swapped for 90 and 270 degrees.
+        """
+        width, height = self.__logicalSize(rotation)
+        self.__wait()
+        self.__rotation = rotation
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.__allocate()
+        self.command(0x36)
+        self.data(self.__madctl[rotation])
+        if self.__scrollArea is not None:
+            self.__scrollArea, self.__scrollOffset = None, 0
+            self.__sendScroll(0, max(self.__panelSize), 0, 0)
+        # The panel memory is now addressed differently
+        self.__lastValid = False
+
+    @property
+    def canScroll(self):
+        """Hardware scrolling runs along the panel's long side, the logical vertical only when MV is clear"""
+        return self.scrollsAt(self.__rotation)
+
+    @classmethod
+    def scrollsAt(cls, rotation):
+        """Whether the logical vertical can be scrolled in hardware at a rotation, without a panel"""
+        return not cls.__madctl[rotation] & 0x20
+
+    def scroll(self, top, bottom, dy):
+        """
+        Move the content of logical rows [top, bottom) up by dy rows, down
+        for a negative dy, through the vertical scrolling of the panel
+        (VSCRDEF 0x33, VSCSAD 0x37). Nothing is redrawn: the next frame is
+        compared against the moved content, so only the rows scrolled in
+        and whatever else changed are sent. The panel memory keeps the
+        rows where they were written, later windows are remapped.
+        Returns False and does nothing when the rotation or area does not allow it.
+        """
+        if not self.canScroll or not 0 <= top < bottom <= self.height:
+            return False
+        self.__wait()
+        height = bottom - top
+        if self.__scrollArea != (top, bottom):
+            if self.__scrollOffset:
+                # Rows still sit where the old area put them
+                self.__lastValid = False
+            self.__scrollArea, self.__scrollOffset = (top, bottom), 0
+        dy %= height
+        self.__scrollOffset = (self.__scrollOffset + dy) % height
+        self.__lastFrame[top:bottom] = numpy.roll(self.__lastFrame[top:bottom], -dy, axis=0)
+
+        lines = self.height
+        if self.__madctl[self.__rotation] & 0x80:
+            # MY mirrors the rows, the fixed areas and the scroll direction swap
+            fixedTop = lines - bottom
+            start = fixedTop + (-self.__scrollOffset) % height
+            self.__sendScroll(fixedTop, height, top, start)
         else:
-            Pin.off()
+            self.__sendScroll(top, height, lines - bottom, top + self.__scrollOffset)
+        return True
+
+    def __sendScroll(self, fixedTop, height, fixedBottom, start):
+        self.__transport.command(0x33)
+        self.__transport.data((
+            fixedTop >> 8, fixedTop & 0xff,
+            height >> 8, height & 0xff,
+            fixedBottom >> 8, fixedBottom & 0xff
+        ))
+        self.__transport.command(0x37)
+        self.__transport.data((start >> 8, start & 0xff))
 
-    def __digitalRead(self, Pin):
-        return Pin.value
+    def __rowRuns(self, y0, y1):
+        """
+        Split logical rows [y0, y1) into runs that are contiguous in the
+        panel memory, as (first row, end row, first memory row)
+        """
+        if not self.__scrollOffset:
+            return [(y0, y1, y0)]
+        top, bottom = self.__scrollArea
+        runs = []
+        if y0 < top:
+            runs.append((y0, min(y1, top), y0))
+        start, end = max(y0, top), min(y1, bottom)
+        if start < end:
+            address = top + (start - top + self.__scrollOffset) % (bottom - top)
+            # Rows past the end of the area wrap around to its top
+            split = min(end, start + bottom - address)
+            runs.append((start, split, address))
+            if split < end:
+                runs.append((split, end, top))
+        if y1 > bottom:
+            start = max(y0, bottom)
+            runs.append((start, y1, start))
+        return runs
 
-    def __SPIWriteByte(self, data):
-        if self.SPI != None:
-            self.SPI.writebytes(data)
+    @property
+    def transport(self):
+        return self.__transport
+
+    def backlight(self, state: bool):
+        self.__transport.backlight(state)
+
+    def setBrightness(self, level):
+        """Dim the backlight, 0 to 1, where the transport can"""
+        if hasattr(self.__transport, 'brightness'):
+            self.__transport.brightness(level)
+
+    def moduleExit(self):
+        self.__wait()
+        if self.__writer is not None and self.__writerPid == os.getpid():
+            self.__writer.shutdown()
+        logging.debug("spi end, gpio cleanup...")
+        self.__transport.close()
 
     def command(self, cmd):
-        self.__digitalWrite(self.DC_PIN, False)
-        self.__SPIWriteByte([cmd])
+        self.__wait()
+        self.__transport.command(cmd)
 
     def data(self, val):
-        self.__digitalWrite(self.DC_PIN, True)
-        self.__SPIWriteByte([val])
+        self.__wait()
+        self.__transport.data([val])
 
     def reset(self):
         """Reset the display"""
-        self.__digitalWrite(self.RST_PIN, True)
-        time.sleep(0.01)
-        self.__digitalWrite(self.RST_PIN, False)
-        time.sleep(0.01)
-        self.__digitalWrite(self.RST_PIN, True)
-        time.sleep(0.01)
+        self.__wait()
+        self.__lastValid = False
+        self.__scrollArea, self.__scrollOffset = None, 0
+        self.__transport.reset()
+
+    def __submit(self, job):
+        """Run a transfer on the writer thread once the previous one is done"""
+        if self.__writer is None or self.__writerPid != os.getpid():
+            self.__writer = ThreadPoolExecutor(1, thread_name_prefix='lcdWriter')
+            self.__writerPid = os.getpid()
+            self.__inFlight = None
+        self.__wait()
+        self.__inFlight = self.__writer.submit(job)
 
+    def __wait(self):
+        """Block until the writer thread is idle, re-raising what the transfer raised"""
+        if self.__inFlight is not None and self.__writerPid == os.getpid():
+            inFlight, self.__inFlight = self.__inFlight, None
+            inFlight.result()
+
+    def flush(self):
+        """Wait until everything handed to the writer thread is on the panel"""
+        self.__wait()
+
+    def __account(self, sent, seconds):
+        self.__sentBytes += sent
+        self.__sendTime += seconds
+        self.__reportBytes += sent
+        self.__reportTime += seconds
+        now = time.monotonic()
+        if now - self.__lastReport >= 10 and self.__reportTime:
+            logging.debug("spi {:.2f} MB/s of {:.2f} MB/s at {} MHz".format(
+                self.__reportBytes / self.__reportTime / 1e6,
+                self.__frequency / 8e6,
+                self.__frequency // 1000000
+            ))
+            self.__reportBytes, self.__reportTime, self.__lastReport = 0, 0.0, now
+
+    @property
+    def throughput(self):
+        """Pixel bytes sent, seconds spent sending them and the rate against the bus maximum"""
+        rate = self.__sentBytes / self.__sendTime if self.__sendTime else 0.0
+        return {
+            'bytes': self.__sentBytes,
+            'seconds': self.__sendTime,
+            'MB/s': rate / 1e6,
+            'max MB/s': self.__frequency / 8e6,
+            'utilization': rate * 8 / self.__frequency
+        }
+
+    @tracer.traced('Lcd.Init')
     def Init(self):
-        """Initialize dispaly"""
-        self.reset()
-        self.command(0x36)
-        self.data(0x00)
-        self.command(0x3A)
-        self.data(0x05)
-        self.command(0x21)
-        self.command(0x2A)
-        self.data(0x00)
-        self.data(0x00)
-        self.data(0x01)
-        self.data(0x3F)
-        self.command(0x2B)
-        self.data(0x00)
-        self.data(0x00)
-        self.data(0x00)
-        self.data(0xEF)
-        self.command(0xB2)
-        self.data(0x0C)
-        self.data(0x0C)
-        self.data(0x00)
-        self.data(0x33)
-        self.data(0x33)
-        self.command(0xB7)
-        self.data(0x35)
-        self.command(0xBB)
-        self.data(0x1F)
-        self.command(0xC0)
-        self.data(0x2C)
-        self.command(0xC2)
-        self.data(0x01)
-        self.command(0xC3)
-        self.data(0x12)
-        self.command(0xC4)
-        self.data(0x20)
-        self.command(0xC6)
-        self.data(0x0F)
-        self.command(0xD0)
-        self.data(0xA4)
-        self.data(0xA1)
-        self.command(0xE0)
-        self.data(0xD0)
-        self.data(0x08)
-        self.data(0x11)
-        self.data(0x08)
-        self.data(0x0C)
-        self.data(0x15)
-        self.data(0x39)
-        self.data(0x33)
-        self.data(0x50)
-        self.data(0x36)
-        self.data(0x13)
-        self.data(0x14)
-        self.data(0x29)
-        self.data(0x2D)
-        self.command(0xE1)
-        self.data(0xD0)
-        self.data(0x08)
-        self.data(0x10)
-        self.data(0x08)
-        self.data(0x06)
-        self.data(0x06)
-        self.data(0x39)
-        self.data(0x44)
-        self.data(0x51)
-        self.data(0x0B)
-        self.data(0x16)
-        self.data(0x14)
-        self.data(0x2F)
-        self.data(0x31)
-        self.command(0x21)
-        self.command(0x11)
-        self.command(0x29)
+        """
+        Initialize dispaly. A panel the bootstrap already initialized is not reset,
+        so its splash stays up until the first frame replaces it
+        """
+        if not getattr(self.__transport, 'initialized', False):
+            self.reset()
+            for command, parameters in ST7789_INIT:
+                self.command(command)
+                if parameters:
+                    self.__transport.data(parameters)
+        self.setRotation(self.__rotation)
 
-    def __setWindows(self, Xstart, Ystart, Xend, Yend):
-        # set the X coordinates
-        self.command(0x2A)
-        # Set the horizontal starting point to the high octet
-        self.data(Xstart >> 8)
-        # Set the horizontal starting point to the low octet
-        self.data(Xstart & 0xff)
-        self.data(Xend >> 8)  # Set the horizontal end to the high octet
-        self.data((Xend - 1) & 0xff)  # Set the horizontal end to the low octet
+    def cacheFrame(self, path):
+        """Save what the panel shows as a packed frame the bootstrap can put up at the next start"""
+        self.__wait()
+        if not self.__lastValid:
+            return False
+        splash.savePacked(path, self.__lastFrame, self.width, self.height, self.__madctl[self.__rotation])
+        return True
 
+    def __setWindows(self, Xstart, Ystart, Xend, Yend):
+        # Xend and Yend are exclusive, the panel expects the last address
+        Xend, Yend = Xend - 1, Yend - 1
+        # Runs on the writer thread too, so it talks to the transport directly
+        # set the X coordinates, start and end as high and low octets
+        self.__transport.command(0x2A)
+        self.__transport.data((Xstart >> 8, Xstart & 0xff, Xend >> 8, Xend & 0xff))
         # set the Y coordinates
-        self.command(0x2B)
-        self.data(Ystart >> 8)
-        self.data((Ystart & 0xff))
-        self.data(Yend >> 8)
-        self.data((Yend - 1) & 0xff)
+        self.__transport.command(0x2B)
+        self.__transport.data((Ystart >> 8, Ystart & 0xff, Yend >> 8, Yend & 0xff))
+
+        self.__transport.command(0x2C)
+
+    def pack(self, img):
+        """
+        Pack a BGR888 frame into the RGB565 buffer sent to the panel.
+        The returned array is reused by the next call.
+        """
+        imheight, imwidth, _ = img.shape
+        if imwidth != self.width or imheight != self.height:
+            img = cv2.resize(img, (self.width, self.height), dst=self.__resized)
+        numpy.take(self.__redTable, img[..., 2], out=self.__buffer)
+        numpy.take(self.__greenTable, img[..., 1], out=self.__scratch)
+        numpy.bitwise_or(self.__buffer, self.__scratch, out=self.__buffer)
+        numpy.take(self.__blueTable, img[..., 0], out=self.__scratch)
+        numpy.bitwise_or(self.__buffer, self.__scratch, out=self.__buffer)
+        return self.__buffer
+
+    def dirtyRegions(self, pix):
+        """
+        Compare a packed frame against the last one sent, tile by tile.
+        Returns a list of (x0, y0, x1, y1) rectangles covering the changed
+        tiles, or None when the whole frame should be sent.
+        """
+        if not self.__lastValid:
+            return None
+        diff = numpy.not_equal(pix, self.__lastFrame)
+        tiles = numpy.logical_or.reduceat(diff, self.__rowStarts, axis=0)
+        tiles = numpy.logical_or.reduceat(tiles, self.__columnStarts, axis=1)
+        changed = numpy.count_nonzero(tiles)
+        if changed == 0:
+            return []
+        if changed > tiles.size * self.__fullFrameRatio:
+            return None
+
+        # Runs of changed tiles per row, stacked into rectangles while a run keeps its span
+        regions = []
+        stacks = {}
+        for row in numpy.flatnonzero(tiles.any(axis=1)):
+            columns = numpy.flatnonzero(tiles[row])
+            gaps = numpy.flatnonzero(numpy.diff(columns) > 1)
+            lefts = [columns[0]] + columns[gaps + 1].tolist()
+            rights = columns[gaps].tolist() + [columns[-1]]
+            following = {}
+            for span in zip(lefts, (right + 1 for right in rights)):
+                region = stacks.get(span)
+                if region and region[3] == row:
+                    region[3] = row + 1
+                else:
+                    region = [span[0], row, span[1], row + 1]
+                    regions.append(region)
+                following[span] = region
+            stacks = following
 
-        self.command(0x2C)
+        # Too many windows cost more in commands than they save, merge the
+        # pair whose bounding box adds the fewest tiles until few enough are left
+        while len(regions) > self.__maxRegions:
+            area = lambda r: (r[2] - r[0]) * (r[3] - r[1])
+            cost, i, j, merged = min(
+                (area(box) - area(a) - area(b), i, j, box)
+                for i, a in enumerate(regions)
+                for j, b in enumerate(regions[i + 1:], i + 1)
+                for box in ([min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])],)
+            )
+            regions[i] = merged
+            del regions[j]
+        t = self.__tileSize
+        return [
+            (
+                int(r[0]) * t, int(r[1]) * t,
+                min(int(r[2]) * t, self.width), min(int(r[3]) * t, self.height)
+            )
+            for r in regions
+        ]
 
     def showImage(self, img):
         if img is None:
             logging.error("Image is None")
             return
+        start = time.perf_counter()
         try:
-            imheight, imwidth, _ = img.shape
-            if imwidth != self.width or imheight != self.height:
-                img = cv2.resize(img, (self.width, self.height))
+            pix = self.pack(img)
         except ValueError:
             logging.error("Image shape is not valid")
             return
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        pix = numpy.zeros((self.height, self.width, 2), dtype=numpy.uint8)
-        # RGB888 >> RGB565
-        pix[..., [0]] = numpy.add(numpy.bitwise_and(
-            img[..., [0]], 0xF8), numpy.right_shift(img[..., [1]], 5))
-        pix[..., [1]] = numpy.add(numpy.bitwise_and(numpy.left_shift(
-            img[..., [1]], 3), 0xE0), numpy.right_shift(img[..., [2]], 3))
-        pix = pix.flatten().tolist()
-        self.command(0x36)
-        self.data(0x70)
-        self.__setWindows(0, 0, self.width, self.height)
-        self.__digitalWrite(self.DC_PIN, True)
-        for i in range(0, len(pix), 4096):
-            self.__SPIWriteByte(pix[i:i+4096])
+        regions = self.dirtyRegions(pix)
+        if regions is None:
+            regions = [(0, 0, self.width, self.height)]
+        regions = [
+            (x0, y0, x1, y1, address)
+            for x0, top, x1, bottom in regions
+            for y0, y1, address in self.__rowRuns(top, bottom)
+        ]
+        PREPARE.observe(time.perf_counter() - start)
+        job = self.__frameJob(pix, regions)
+        if self.__writerThread:
+            self.__submit(job)
+        else:
+            job()
+        # The frame just sent becomes the reference, its buffer is packed into
+        # again only after this transfer is done, see __submit
+        self.__buffer, self.__lastFrame = self.__lastFrame, self.__buffer
+        self.__lastValid = True
+
+    def __frameJob(self, pix, regions):
+        def job():
+            start = time.perf_counter()
+            sent = 0
+            for x0, y0, x1, y1, address in regions:
+                self.__setWindows(x0, address, x1, address + y1 - y0)
+                if (x0, x1) == (0, self.width):
+                    block = pix[y0:y1]
+                else:
+                    block = numpy.ascontiguousarray(pix[y0:y1, x0:x1])
+                self.__transport.write(block)
+                sent += block.nbytes
+            if sent:
+                self.__account(sent, time.perf_counter() - start)
+            TRANSFER.observe(time.perf_counter() - start)
+        return job
 
     def clear(self):
         """Clear contents of image buffer"""
-        _buffer = [0xff]*(self.width * self.height * 2)
-        self.__setWindows(0, 0, self.height, self.width)
-        self.__digitalWrite(self.DC_PIN, True)
-        for i in range(0, len(_buffer), 4096):
-            self.__SPIWriteByte(_buffer[i:i+4096])
+        self.__wait()
+        self.__setWindows(0, 0, self.width, self.height)
+        self.__transport.write(self.__blank)
+        self.__lastFrame.fill(0xffff)
+        self.__lastValid = True
 
 
 if __name__ == '__main__':
@@ -0,0 +1,354 @@
+import logging
+import time
+from collections import Counter
+
+from components import configLoader
+
+BUFSIZ_PATH = '/sys/module/spidev/parameters/bufsiz'
+
+# ST7789 power-on sequence sent after a reset, command byte and parameter bytes,
+# ending with sleep out and display on. The MADCTL set here is replaced by Lcd.setRotation
+ST7789_INIT = (
+    (0x36, (0x00,)),
+    (0x3A, (0x05,)),
+    (0x21, ()),
+    (0x2A, (0x00, 0x00, 0x01, 0x3F)),
+    (0x2B, (0x00, 0x00, 0x00, 0xEF)),
+    (0xB2, (0x0C, 0x0C, 0x00, 0x33, 0x33)),
+    (0xB7, (0x35,)),
+    (0xBB, (0x1F,)),
+    (0xC0, (0x2C,)),
+    (0xC2, (0x01,)),
+    (0xC3, (0x12,)),
+    (0xC4, (0x20,)),
+    (0xC6, (0x0F,)),
+    (0xD0, (0xA4, 0xA1)),
+    (0xE0, (0xD0, 0x08, 0x11, 0x08, 0x0C, 0x15, 0x39, 0x33, 0x50, 0x36, 0x13, 0x14, 0x29, 0x2D)),
+    (0xE1, (0xD0, 0x08, 0x10, 0x08, 0x06, 0x06, 0x39, 0x44, 0x51, 0x0B, 0x16, 0x14, 0x2F, 0x31)),
+    (0x21, ()),
+    (0x11, ()),
+    (0x29, ()),
+)
+
+
+def initPanel(transport):
+    """Reset the panel and send the power-on sequence, on its own for the bootstrap"""
+    transport.reset()
+    for command, parameters in ST7789_INIT:
+        transport.command(command)
+        if parameters:
+            transport.data(parameters)
+    transport.initialized = True
+
+
+def spidevBufsiz(default=4096):
+    """Largest payload of one spidev transfer, set by the spidev.bufsiz module parameter"""
+    try:
+        with open(BUFSIZ_PATH) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+class SpiTransport():
+    """
+    The ST7789 wiring of the board: spidev for the bus, gpiozero pins for
+    reset, data/command and backlight. gpiozero and spidev are only imported
+    here, so Lcd can be used with the stand-ins below on any Linux box. The
+    module itself imports neither them nor numpy, the bootstrap uses it to
+    show the splash before anything heavy is loaded.
+
+    Args:
+        spi_freq (int): Bus clock in Hz.
+        chunkSize (int): Bytes per transfer call, capped at and defaulting to the kernel bufsiz.
+
+    Attributes:
+        frequency (int): Bus clock in Hz.
+        bufsiz (int): Largest transfer the spidev driver accepts.
+        chunkSize (int): Bytes per transfer call used by write().
+        initialized (bool): Set by initPanel, Lcd.Init then keeps what the panel shows.
+
+    Methods:
+        command(cmd): Send one command byte.
+        data(values): Send parameter bytes for the last command.
+        write(buffer): Send a bytes-like object of pixel data, chunkSize bytes per transfer.
+        reset(): Pulse the reset pin.
+        backlight(state): Switch the backlight.
+        brightness(level): Dim the backlight through PWM, 0 to 1.
+        close(): Release the bus and the pins.
+    """
+
+    def __init__(self, spi_freq=80000000, bus=0, device=0, chunkSize=None):
+        import gpiozero
+        import spidev
+
+        config = configLoader.ConfigLoader('./config.json')
+        self.RST_PIN = gpiozero.DigitalOutputDevice(
+            config['pin']['rst'],
+            active_high=True,
+            initial_value=False
+        )
+        self.DC_PIN = gpiozero.DigitalOutputDevice(
+            config['pin']['dc'],
+            active_high=True,
+            initial_value=False
+        )
+        self.BL_PIN = gpiozero.PWMOutputDevice(
+            config['pin']['bl'],
+            active_high=True,
+            initial_value=0,
+            frequency=config['screen'].get('backlight_pwm_frequency', 1000)
+        )
+        self.frequency = spi_freq
+        self.initialized = False
+        self.bufsiz = spidevBufsiz()
+        self.chunkSize = min(chunkSize or self.bufsiz, self.bufsiz)
+        logging.debug("spidev bufsiz {}, {} bytes per transfer".format(self.bufsiz, self.chunkSize))
+        self.SPI = spidev.SpiDev(bus, device)
+        if self.SPI != None:
+            self.SPI.max_speed_hz = spi_freq
+            self.SPI.mode = 0b00
+
+    def __digitalWrite(self, pin, value: bool):
+        if value:
+            pin.on()
+        else:
+            pin.off()
+
+    def command(self, cmd):
+        self.__digitalWrite(self.DC_PIN, False)
+        if self.SPI != None:
+            self.SPI.writebytes([cmd])
+
+    def data(self, values):
+        self.__digitalWrite(self.DC_PIN, True)
+        if self.SPI != None:
+            self.SPI.writebytes(list(values))
+
+    def write(self, buffer):
+        """Send a C contiguous bytes-like object in chunks of at most chunkSize bytes"""
+        self.__digitalWrite(self.DC_PIN, True)
+        if self.SPI != None:
+            view = memoryview(buffer).cast('B')
+            for start in range(0, view.nbytes, self.chunkSize):
+                self.SPI.writebytes2(view[start:start + self.chunkSize])
+
+    def reset(self):
+        self.__digitalWrite(self.RST_PIN, True)
+        time.sleep(0.01)
+        self.__digitalWrite(self.RST_PIN, False)
+        time.sleep(0.01)
+        self.__digitalWrite(self.RST_PIN, True)
+        time.sleep(0.01)
+
+    def backlight(self, state: bool):
+        self.__digitalWrite(self.BL_PIN, state)
+
+    def brightness(self, level):
+        self.BL_PIN.value = min(1.0, max(0.0, level))
+
+    def close(self):
+        if self.SPI != None:
+            self.SPI.close()
+        self.__digitalWrite(self.RST_PIN, 1)
+        self.__digitalWrite(self.DC_PIN, 0)
+        self.BL_PIN.close()
+        time.sleep(0.001)
+
+
+class RecordingTransport():
+    """
+    Stand-in for SpiTransport that keeps statistics instead of driving hardware.
+
+    Args:
+        chunkSize (int): Split writes like SpiTransport does, None for one transfer per write.
+        frequency (int): When given, write() sleeps as long as the bytes would take on
+            a bus at this clock, to benchmark pipelining against a realistic transfer.
+
+    Attributes:
+        bytes (int): Bytes sent, commands and parameters included.
+        pixelBytes (int): Bytes sent through write().
+        transfers (int): Calls that would each have been one SPI transfer.
+        windows (int): Memory writes started with RAMWR.
+        commands (Counter): Count per command byte.
+        writeTime (float): Seconds spent inside write().
+
+    Methods:
+        snapshot(): The counters as a dict.
+        resetStatistics(): Zero the counters.
+    """
+
+    def __init__(self, chunkSize=None, frequency=None):
+        self.chunkSize = chunkSize
+        self.frequency = frequency
+        self.backlightState = False
+        self.brightnessLevel = 1.0
+        self.resetStatistics()
+
+    def resetStatistics(self):
+        self.bytes = 0
+        self.pixelBytes = 0
+        self.transfers = 0
+        self.windows = 0
+        self.commands = Counter()
+        self.writeTime = 0.0
+
+    def snapshot(self):
+        return {
+            'bytes': self.bytes,
+            'pixelBytes': self.pixelBytes,
+            'transfers': self.transfers,
+            'windows': self.windows,
+            'commands': sum(self.commands.values()),
+            'writeTime': self.writeTime
+        }
+
+    def command(self, cmd):
+        self.bytes += 1
+        self.transfers += 1
+        self.commands[cmd] += 1
+        if cmd == 0x2C:
+            self.windows += 1
+
+    def data(self, values):
+        self.bytes += len(values)
+        self.transfers += 1
+
+    def write(self, buffer):
+        start = time.perf_counter()
+        size = memoryview(buffer).nbytes
+        self.bytes += size
+        self.pixelBytes += size
+        self.transfers += -(-size // self.chunkSize) if self.chunkSize else 1
+        if self.frequency:
+            time.sleep(size * 8 / self.frequency)
+        self.writeTime += time.perf_counter() - start
+
+    def reset(self):
+        pass
+
+    def backlight(self, state: bool):
+        self.backlightState = state
+
+    def brightness(self, level):
+        self.brightnessLevel = level
+
+    def close(self):
+        pass
+
+
+class FramebufferTransport(RecordingTransport):
+    """
+    RecordingTransport that also decodes the command stream into a copy of
+    the panel memory, so what the panel would show can be checked off the
+    device. CASET, RASET, RAMWR, MADCTL and the vertical scrolling commands
+    VSCRDEF and VSCSAD are interpreted, the rest is only counted.
+
+    Args:
+        width, height: Size of the panel in its unrotated, landscape orientation.
+
+    Attributes:
+        memory (numpy.ndarray): The panel memory as big-endian RGB565 words,
+            in the native portrait layout of the ST7789.
+
+    Methods:
+        display: The memory in the order the panel shows its lines, after scrolling.
+        image: The panel content as a BGR888 image, seen in landscape the way
+            Lcd draws it at rotation 0.
+    """
+
+    def __init__(self, width=320, height=240):
+        import numpy
+
+        super().__init__()
+        # The controller is portrait, Lcd turns it to landscape through MADCTL
+        self.memory = numpy.full((width, height), 0xffff, numpy.dtype('>u2'))
+        self.__command = None
+        self.__parameters = []
+        self.__madctl = 0
+        self.__columns = (0, height - 1)
+        self.__rows = (0, width - 1)
+        self.__pointer = 0
+        self.__scrollArea = (0, width, 0)
+        self.__scrollStart = 0
+
+    def reset(self):
+        super().reset()
+        self.__madctl = 0
+        self.__scrollArea = (0, self.memory.shape[0], 0)
+        self.__scrollStart = 0
+
+    def command(self, cmd):
+        super().command(cmd)
+        self.__command = cmd
+        self.__parameters = []
+        if cmd == 0x2C:
+            self.__pointer = 0
+
+    def data(self, values):
+        super().data(values)
+        self.__parameters.extend(int(v) for v in values)
+        if self.__command == 0x36 and len(self.__parameters) >= 1:
+            self.__madctl = self.__parameters[0]
+        elif self.__command in (0x2A, 0x2B) and len(self.__parameters) >= 4:
+            p = self.__parameters
+            span = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+            if self.__command == 0x2A:
+                self.__columns = span
+            else:
+                self.__rows = span
+        elif self.__command == 0x33 and len(self.__parameters) >= 6:
+            p = self.__parameters
+            self.__scrollArea = ((p[0] << 8) | p[1], (p[2] << 8) | p[3], (p[4] << 8) | p[5])
+        elif self.__command == 0x37 and len(self.__parameters) >= 2:
+            self.__scrollStart = (self.__parameters[0] << 8) | self.__parameters[1]
+
+    def write(self, buffer):
+        super().write(buffer)
+        if self.__command != 0x2C:
+            return
+        import numpy
+
+        pixels = numpy.frombuffer(memoryview(buffer).cast('B'), numpy.dtype('>u2'))
+        x0, x1 = self.__columns
+        y0, y1 = self.__rows
+        windowWidth = x1 - x0 + 1
+        index = numpy.arange(self.__pointer, self.__pointer + pixels.size)
+        index %= windowWidth * (y1 - y0 + 1)
+        self.__pointer += pixels.size
+        rows, columns = self.__address(x0 + index % windowWidth, y0 + index // windowWidth)
+        self.memory[rows, columns] = pixels
+
+    def __address(self, x, y):
+        """Map MCU column/page addresses to the panel memory through MADCTL"""
+        panelRows, panelColumns = self.memory.shape
+        if self.__madctl & 0x20:  # MV
+            x, y = y, x
+        if self.__madctl & 0x40:  # MX
+            x = panelColumns - 1 - x
+        if self.__madctl & 0x80:  # MY
+            y = panelRows - 1 - y
+        return y, x
+
+    @property
+    def display(self):
+        import numpy
+
+        lines = numpy.arange(self.memory.shape[0])
+        fixedTop, height, fixedBottom = self.__scrollArea
+        if height and fixedTop + height + fixedBottom == lines.size:
+            # Line fixedTop shows memory row scrollStart, the rest of the area follows and wraps
+            area = lines[fixedTop:fixedTop + height]
+            area[:] = fixedTop + (area - fixedTop + self.__scrollStart - fixedTop) % height
+        return self.memory[lines]
+
+    @property
+    def image(self):
+        import numpy
+
+        view = self.display[:, ::-1].T.astype(numpy.uint16)
+        image = numpy.empty(view.shape + (3,), numpy.uint8)
+        image[..., 2] = (view >> 8) & 0xF8
+        image[..., 1] = (view >> 3) & 0xFC
+        image[..., 0] = (view << 3) & 0xF8
+        return image
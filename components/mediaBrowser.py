@@ -1,4 +1,3 @@
-import imghdr
 import os
 import threading
 import time
@@ -6,6 +5,8 @@ import cv2
 import numpy as np
 from typing import List, Tuple, Optional, Dict, Union
 
+from utils.bootTrace import tracer
+
 
 class MediaBrowser:
     """
@@ -104,6 +105,7 @@ class MediaBrowser:
         # Loading animation
         self.__loadingAnimation = 0
 
+    @tracer.traced('MediaBrowser.refreshMediaList')
     def refreshMediaList(self):
         """
         Refreshes the list of media files in the specified media directory.
@@ -127,6 +129,9 @@ class MediaBrowser:
 
         # Discover supported media files
         self.__mediaFiles = []
+        # Only needed once media is listed, kept off the boot path
+        import imghdr
+
         supportedImageFormats = {'jpeg', 'jpg',
                                  'png', 'bmp', 'tiff', 'webp', 'gif'}
         supportedVideoFormats = {'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv'}
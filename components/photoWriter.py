@@ -0,0 +1,159 @@
+import functools
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils import metrics
+
+PENDING = metrics.registry.gauge('writer.pending')
+ENCODE = metrics.registry.histogram('writer.encode')
+WRITTEN = metrics.registry.counter('writer.written')
+FAILED = metrics.registry.counter('writer.failed')
+
+
+class PhotoWriter:
+    """
+    Encodes and writes the shots the camera captured on a bounded pool of threads, so a shot only
+    costs the camera the capture. The image, the metadata and the DNG of a shot are separate jobs
+    and run in parallel, OpenCV and zlib release the GIL while encoding. Every file goes through
+    a temporary name, the gallery never lists half a photo. A part that fails is logged, raised
+    from its future and counts the shot as failed instead of written.
+
+    Args:
+        workers (int): Encoding threads.
+        depth (int): Shots held in memory at most, submit() blocks while that many are pending.
+
+    Attributes:
+        pending (int): Shots accepted and not completely written yet.
+        failed (int): Shots with a part that could not be written, since the start.
+        depth (int): Default bound of submit().
+
+    Methods:
+        submit(path, frame, fmat, rotate, decorate, metadata, raw, depth): Queue a shot, returns its futures.
+        wait(): Block until every pending shot is written.
+        shutdown(): Write what is pending and stop the threads.
+    """
+
+    def __init__(self, workers=2, depth=4):
+        self.__pool = ThreadPoolExecutor(workers, thread_name_prefix='photoWriter')
+        self.depth = depth
+        self.__lock = threading.Condition()
+        self.__pending = 0
+        self.__failed = 0
+
+    @property
+    def pending(self):
+        return self.__pending
+
+    @property
+    def failed(self):
+        return self.__failed
+
+    def submit(self, path, frame=None, fmat=None, rotate=0, decorate=None, metadata=None, raw=None, depth=None):
+        """
+        Queue a shot saved as path plus the extension of each part.
+
+        Args:
+            path (str): File path without extension, its directory is created when missing.
+            frame (numpy.ndarray): RGB image, encoded as fmat, 'jpg' or 'png' for instance.
+            rotate (int): Clockwise rotation in degrees, a multiple of 90, applied before decorate.
+            decorate (callable): Draws on the BGR image in place before the single encode.
+            metadata (dict): Written as JSON.
+            raw (callable): Encodes the DNG into the io.BytesIO it is given.
+            depth (int): Bound for this shot instead of the default, a burst sizes it to the free memory.
+        """
+        jobs = []
+        if frame is not None and fmat:
+            jobs.append(functools.partial(self.__writeImage, path, frame, fmat, rotate, decorate))
+        if metadata is not None:
+            jobs.append(functools.partial(self.__writeMetadata, path + '.json', metadata))
+        if raw is not None:
+            jobs.append(functools.partial(self.__writeDng, path + '.dng', raw))
+        if not jobs:
+            return []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        depth = depth or self.depth
+        with self.__lock:
+            self.__lock.wait_for(lambda: self.__pending < depth)
+            self.__pending += 1
+            PENDING.set(self.__pending)
+        shot = {'remaining': len(jobs), 'failed': False}
+        return [self.__pool.submit(self.__run, job, shot) for job in jobs]
+
+    def __run(self, job, shot):
+        start = time.perf_counter()
+        try:
+            job()
+        except Exception:
+            shot['failed'] = True
+            logging.exception("Writing a part of {} failed".format(job.args[0]))
+            raise
+        finally:
+            ENCODE.observe(time.perf_counter() - start)
+            with self.__lock:
+                shot['remaining'] -= 1
+                if shot['remaining'] == 0:
+                    self.__pending -= 1
+                    PENDING.set(self.__pending)
+                    if shot['failed']:
+                        self.__failed += 1
+                        FAILED.inc()
+                    else:
+                        WRITTEN.inc()
+                    self.__lock.notify_all()
+
+    @staticmethod
+    def __writeAtomic(path, write):
+        temporary = path + '.tmp'
+        write(temporary)
+        os.replace(temporary, path)
+
+    def __writeImage(self, path, frame, fmat, rotate, decorate):
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        if rotate:
+            frame = np.ascontiguousarray(np.rot90(frame, -rotate // 90))
+        if decorate is not None:
+            decorate(frame)
+        ok, encoded = cv2.imencode('.' + fmat, frame)
+        if not ok:
+            raise ValueError("Cannot encode {} as {}".format(path, fmat))
+
+        def write(temporary):
+            with open(temporary, 'wb') as f:
+                f.write(encoded.data)
+        self.__writeAtomic('{}.{}'.format(path, fmat), write)
+
+    def __writeDng(self, path, raw):
+        # Encoded in memory, PiDNG appends .dng to a file name that does not end with it
+        encoded = io.BytesIO()
+        raw(encoded)
+
+        def write(temporary):
+            with open(temporary, 'wb') as f:
+                f.write(encoded.getbuffer())
+        self.__writeAtomic(path, write)
+
+    def __writeMetadata(self, path, metadata):
+        def write(temporary):
+            with open(temporary, 'w') as f:
+                json.dump(metadata, f, indent=4)
+        self.__writeAtomic(path, write)
+
+    def wait(self):
+        with self.__lock:
+            self.__lock.wait_for(lambda: self.__pending == 0)
+
+    def shutdown(self):
+        self.__pool.shutdown(wait=True)
+        if self.__pending:
+            logging.warning("{} shots were not written".format(self.__pending))
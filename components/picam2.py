@@ -1,4 +1,4 @@
-import json
+import functools
 import logging
 import os
 import threading
@@ -10,27 +10,65 @@ import picamera2
 from picamera2 import YUV420_to_RGB
 from picamera2.encoders import H264Encoder
 from picamera2.outputs import FfmpegOutput
-from libcamera import controls
+from libcamera import controls, ColorSpace
 
-from . import configLoader
+from utils import metrics, SlidingWindowFilter
+from utils.bootTrace import tracer
+from . import configLoader, photoWriter
+
+CAPTURE = metrics.registry.histogram('camera.capture')
+CONVERT = metrics.registry.histogram('camera.convert')
+FPS = metrics.registry.gauge('camera.fps')
+RESUME = metrics.registry.histogram('camera.resume')
+STREAMING = metrics.registry.gauge('camera.streaming')
+CAPTURED = metrics.registry.counter('camera.captured')
+SETTLE = metrics.registry.histogram('camera.settle')
+PREVIEWED = metrics.registry.counter('camera.previewed')
+STILL = metrics.registry.histogram('camera.still')
+BURST = metrics.registry.histogram('camera.burst')
+
+# Lores buffers the capture thread copies into: the one being read, the latest and the one being written
+RING = 3
+# How often preview() looks whether a burst holds the camera while it waits for a capture
+HELD_POLL = 0.1
 
 
 class Cam:
+    """
+    The camera, previewing on lores and switching modes for stills and recordings.
+
+    A capture thread dequeues every request, copies lores into a ring of preallocated buffers,
+    takes the metadata and releases the request at once, so the sensor never waits for the
+    consumer. preview() converts the latest captured frame and skips the ones it was too slow
+    for. Mode switches hold the lock the capture thread takes for each request.
+    """
+
+    @tracer.traced('Cam.__init__')
     def __init__(self, verbose_console=None, tuning=None):
         self.__cam = picamera2.Picamera2(tuning=tuning)
         # self.__cam = picamera2.Picamera2()
         self.__config = configLoader.ConfigLoader('./config.json')
+        # "panel" asks for lores at the screen size and converts it in one cv2 pass, in the
+        # BT.601 limited range cv2 decodes. "legacy" converts a lores of twice the size with
+        # YUV420_to_RGB, which halves it
+        self.__previewMode = self.__config['camera'].get('preview_mode', 'panel')
+        scale = 1 if self.__previewMode == 'panel' else 2
+        self.__loresSize = (self.__config['screen']['width'] * scale, self.__config['screen']['height'] * scale)
         self.__pictConfig = self.__cam.create_preview_configuration(
             main={"size": (
                 self.__config['screen']['width'] * 2, self.__config['screen']['height'] * 2)},
-            lores={"size": (
-                self.__config['screen']['width'] * 2, self.__config['screen']['height'] * 2)},
+            lores={"size": self.__loresSize},
+            **({'colour_space': ColorSpace.Smpte170m()} if self.__previewMode == 'panel' else {})
         )
         self.__cam.configure(self.__pictConfig)
+        self.__loresStride = self.__cam.stream_configuration('lores')['stride']
         self.__encoder = H264Encoder(self.__config['camera']['video_bitrate'])
+        self.__writer = photoWriter.PhotoWriter(**self.__config['camera']['writer'])
 
         self.__lock = threading.Lock()
         self.__framePerSecond = 0
+        # Frame intervals of the last second or so, one interval makes a jumpy reading
+        self.__frameIntervals = SlidingWindowFilter(30)
         self.__width = self.__config['screen']['width']
         self.__height = self.__config['screen']['height']
         self.__digitalZoom = 1
@@ -38,8 +76,26 @@ class Cam:
         self.__controls = dict()
         self.__metadata = None
         self.__frame = np.zeros((self.__height, self.__width, 3), np.uint8)
+        self.__luma = np.zeros((self.__height, self.__width), np.uint8)
+        self.__standby = False
+        self.__recording = False
+        # perf_counter() of the last resume, until its first frame is captured
+        self.__resumedAt = None
+        self.__ring = [np.empty(self.__loresStride * self.__loresSize[1] * 3 // 2, np.uint8) for _ in range(RING)]
+        # Slot and metadata of the latest capture and its sequence number, the slot preview() reads
+        self.__captured = threading.Condition()
+        self.__latest = (None, None, 0)
+        self.__reading = None
+        # A burst holds the lock for a while, preview() shows its last frame meanwhile
+        self.__holding = False
+        self.__streaming = threading.Event()
+        self.__running = True
         self.__cam.start_preview(picamera2.Preview.NULL)
         self.__cam.start()
+        self.__streaming.set()
+        STREAMING.set(1)
+        self.__captureThread = threading.Thread(target=self.__captureLoop, name='camCapture', daemon=True)
+        self.__captureThread.start()
 
         with self.__lock:
             self.__wOffset, self.__hOffset, self.__fWidth, self.__fHeight = self.__cam.capture_metadata()[
@@ -184,24 +240,98 @@ class Cam:
     def metadata(self):
         return self.__metadata
 
+    @property
+    def luma(self):
+        """
+        The Y plane of the last preview frame at the frame's size, a free grayscale image for
+        analysis and overlays. It is overwritten by the next frame, copy it to keep it
+        """
+        return self.__luma
+
+    def __toFrame(self, buffer):
+        """Convert a lores YUV420 buffer to the BGR frame drawn on and shown"""
+        width, height = self.__loresSize
+        if self.__previewMode != 'panel':
+            self.__luma = np.ascontiguousarray(buffer[:width * height].reshape(height, width)[::2, ::2])
+            return YUV420_to_RGB(buffer, self.__loresSize)
+        stride = self.__loresStride
+        yuv = buffer[:stride * height * 3 // 2].reshape(height * 3 // 2, stride)
+        frame = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+        if stride != width:
+            # Padding ends up on the right of every row
+            frame = np.ascontiguousarray(frame[:, :width])
+            self.__luma = np.ascontiguousarray(yuv[:height, :width])
+        else:
+            self.__luma = yuv[:height]
+        return frame
+
+    def __captureLoop(self):
+        while self.__running:
+            self.__streaming.wait()
+            with self.__lock:
+                # Stopped while this thread waited for the lock, a request would never come
+                if not self.__streaming.is_set() or not self.__running:
+                    continue
+                try:
+                    request = self.__cam.capture_request()
+                except Exception:
+                    logging.exception("Capture failed")
+                    time.sleep(0.1)
+                    continue
+                try:
+                    with self.__captured:
+                        slot = next(i for i in range(RING) if i not in (self.__latest[0], self.__reading))
+                    with picamera2.MappedArray(request, 'lores', reshape=False) as mapped:
+                        np.copyto(self.__ring[slot], mapped.array[:self.__ring[slot].size])
+                    metadata = request.get_metadata()
+                finally:
+                    request.release()
+            if self.__resumedAt is not None:
+                latency = time.perf_counter() - self.__resumedAt
+                RESUME.observe(latency)
+                logging.debug("First frame {:.3f} s after resume".format(latency))
+                self.__resumedAt = None
+            CAPTURED.inc()
+            with self.__captured:
+                self.__latest = (slot, metadata, self.__latest[2] + 1)
+                self.__captured.notify_all()
+
+    def __nextCapture(self, seen):
+        """
+        Wait for a capture newer than sequence number seen and keep its slot from being overwritten.
+        None while a burst holds the camera and nothing is captured for the preview.
+        """
+        with self.__captured:
+            while not self.__captured.wait_for(lambda: self.__latest[2] != seen, HELD_POLL):
+                if self.__holding:
+                    return None
+            self.__reading = self.__latest[0]
+            return self.__latest
+
     def preview(self):
-        present, t = 0, 0
+        t = None
+        # Only frames captured from now on, not what was left from before a standby
+        seen = self.__latest[2]
         while True:
-            with self.__lock:
-                request = self.__cam.capture_request()
-                buffer = request.make_buffer(name="lores")
-                self.__metadata = request.get_metadata()
-                request.release()
-            self.__frame = YUV420_to_RGB(
-                buffer,
-                (
-                    self.__config['screen']['width'] * 2,
-                    self.__config['screen']['height'] * 2
-                )
-            )
+            start = time.perf_counter()
+            capture = self.__nextCapture(seen)
+            if capture is None:
+                # The slot being read is not overwritten, a fresh conversion keeps the view drawing
+                t = None
+                yield self.__frame.copy() if self.__reading is None else self.__toFrame(self.__ring[self.__reading])
+                continue
+            slot, metadata, seen = capture
+            converted = time.perf_counter()
+            CAPTURE.observe(converted - start)
+            self.__metadata = metadata
+            self.__frame = self.__toFrame(self.__ring[slot])
+            PREVIEWED.inc()
+            CONVERT.observe(time.perf_counter() - converted)
             yield self.__frame
-            present = time.time()
-            self.__framePerSecond = 1 / (present - t)
+            present = time.monotonic()
+            if t is not None:
+                self.__framePerSecond = 1 / self.__frameIntervals.addData(present - t).calc()
+                FPS.set(self.__framePerSecond)
             t = present
 
     def startRecording(self, width, height, filePath):
@@ -213,16 +343,15 @@ class Cam:
             if not os.path.exists(directoryPath):
                 os.makedirs(directoryPath)
 
+        # The preview keeps converting lores while recording, it has to stay the same size
         videoConfig = self.__cam.create_video_configuration(
             main={"size": (int(width), int(height))},
-            lores={"size": (int(
-                self.__config['screen']['width'] * 2), int(self.__config['screen']['height'] * 2))}
+            lores={"size": self.__loresSize}
         )
 
         tempConfig = self.__cam.create_preview_configuration(
             main={"size": (int(width), int(height))},
-            lores={"size": (int(
-                self.__config['screen']['width'] * 2), int(self.__config['screen']['height'] * 2))}
+            lores={"size": self.__loresSize}
         )
 
         with self.__lock:
@@ -235,9 +364,11 @@ class Cam:
             self.__zoom()
             output = FfmpegOutput(filePath)
             self.__cam.start_recording(self.__encoder, output)
+            self.__recording = True
 
     def stopRecording(self):
         with self.__lock:
+            self.__recording = False
             self.__cam.stop_recording()
             self.__cam.configure(self.__pictConfig)
             self.__cam.start()
@@ -246,45 +377,164 @@ class Cam:
             self.__zoom()
             self.__cam.set_controls(self.__controls)
 
-    def saveFrame(self, filePath: str, fmat, width, height, rotate=0, saveMetadata=False, saveRaw=False):
-        path, filename = os.path.split(filePath)
-
-        if not os.path.exists(path):
-            os.makedirs(path)
-
+    def __stillConfiguration(self, width, height, saveRaw, bufferCount=1):
         if width == 0 or height == 0:
             width, height = self.__cam.sensor_resolution
+        streams = {'main': {"size": (width, height)}}
         if saveRaw:
-            config = self.__cam.create_still_configuration(
-                main={"size": (width, height)},
-                raw={"size": self.__cam.sensor_resolution}
-            )
-        else:
-            config = self.__cam.create_still_configuration(
-                main={"size": (width, height)},
-            )
-        with self.__lock:
-            self.__cam.switch_mode(config)
-            coordinate = self.__cam.capture_metadata()['ScalerCrop']
-            self.__cam.set_controls(self.__controls)
-            self.__zoom(coordinate)
-            time.sleep(1)
-            request = self.__cam.capture_request()
-            if fmat:
-                frame = request.make_array("main")
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                if rotate:
-                    frame = np.rot90(frame, -rotate // 90)
-                cv2.imwrite("{}.{}".format(filePath, fmat['value']), frame)
-            if saveMetadata:
-                metadata = request.get_metadata()
-                with open('{}.{}'.format(filePath, 'json'), 'w') as f:
-                    json.dump(metadata, f, indent=4)
-            if saveRaw:
-                request.save_dng('{}.{}'.format(filePath, 'dng'))
+            streams['raw'] = {"size": self.__cam.sensor_resolution}
+        return self.__cam.create_still_configuration(buffer_count=bufferCount, **streams)
+
+    def __enterStill(self, config):
+        """Switch to a still configuration with the lock held, keeping zoom and controls, and wait for AE/AWB"""
+        self.__cam.switch_mode(config)
+        coordinate = self.__cam.capture_metadata()['ScalerCrop']
+        self.__cam.set_controls(self.__controls)
+        self.__zoom(coordinate)
+        self.__settle()
+
+    def __leaveStill(self):
+        self.__cam.switch_mode(self.__pictConfig)
+        self.__cam.set_controls(self.__controls)
+
+    def __takeStill(self, fmat, saveRaw):
+        """Copy main, the metadata and raw out of the next request and release it at once"""
+        request = self.__cam.capture_request()
+        try:
+            frame = request.make_array("main") if fmat else None
+            metadata = request.get_metadata()
+            raw = request.make_buffer("raw") if saveRaw else None
+            rawConfig = request.config.get("raw")
+        finally:
             request.release()
-            self.__cam.switch_mode(self.__pictConfig)
-            self.__cam.set_controls(self.__controls)
+        return frame, metadata, raw, rawConfig
+
+    def __submit(self, filePath, still, fmat, rotate, decorate, saveMetadata, depth=None):
+        frame, metadata, raw, rawConfig = still
+        return self.__writer.submit(
+            filePath,
+            frame=frame,
+            fmat=fmat['value'] if fmat else None,
+            rotate=rotate,
+            decorate=decorate,
+            metadata=metadata if saveMetadata else None,
+            raw=None if raw is None else functools.partial(self.__cam.helpers.save_dng, raw, metadata, rawConfig),
+            depth=depth
+        )
+
+    def saveFrame(self, filePath: str, fmat, width, height, rotate=0, saveMetadata=False, saveRaw=False,
+                  decorate=None):
+        """
+        Capture a still and hand it to the photo writer. The camera is back on the preview as soon
+        as the arrays are copied out of the request, the encoding and the writing happen on the
+        writer threads. decorate draws on the BGR image before it is encoded.
+        Returns the futures of the files being written.
+        """
+        config = self.__stillConfiguration(width, height, saveRaw)
+        with self.__lock:
+            start = time.perf_counter()
+            self.__enterStill(config)
+            still = self.__takeStill(fmat, saveRaw)
+            self.__leaveStill()
+            STILL.observe(time.perf_counter() - start)
+        return self.__submit(filePath, still, fmat, rotate, decorate, saveMetadata)
+
+    def burst(self, filePath: str, count, fmat, width, height, rotate=0, saveMetadata=False, saveRaw=False,
+              decorate=None, stop=None):
+        """
+        Switch to the still configuration once and capture frames back to back at the still frame
+        rate of the sensor, count of them, or until the threading.Event stop is set when count is 0,
+        camera.burst.max_frames at most. Frame n is written as filePath_<n>.
+
+        How many frames may wait for the writer is worked out again before every frame from the
+        memory left over camera.burst.reserve_mb, up to camera.burst.max_depth. Once that many wait
+        the capture waits for the writer, so the rate drops to what the writer keeps up with as
+        the memory runs short. The preview shows its last frame meanwhile.
+        Returns the number of frames captured.
+        """
+        # Only needed for a burst, kept off the boot path
+        import psutil
+
+        settings = self.__config['camera']['burst']
+        config = self.__stillConfiguration(width, height, saveRaw, settings['buffers'])
+        mainWidth, mainHeight = config['main']['size']
+        sensorWidth, sensorHeight = self.__cam.sensor_resolution
+        frameBytes = (mainWidth * mainHeight * 3 if fmat else 0) + (sensorWidth * sensorHeight * 2 if saveRaw else 0)
+        limit = min(count, settings['max_frames']) if count else settings['max_frames']
+        reserve = settings['reserve_mb'] * 1024 * 1024
+        taken = 0
+        with self.__lock:
+            self.__holding = True
+            try:
+                self.__enterStill(config)
+                last = time.perf_counter()
+                # A shutter released during the settle still gets its frame
+                while taken < limit and not (taken and stop is not None and stop.is_set()):
+                    spare = psutil.virtual_memory().available - reserve
+                    depth = max(1, min(settings['max_depth'], spare // max(frameBytes, 1)))
+                    still = self.__takeStill(fmat, saveRaw)
+                    self.__submit('{}_{:03d}'.format(filePath, taken), still, fmat, rotate, decorate, saveMetadata,
+                                  depth)
+                    taken += 1
+                    now = time.perf_counter()
+                    BURST.observe(now - last)
+                    last = now
+            finally:
+                self.__leaveStill()
+                self.__holding = False
+        return taken
+
+    @property
+    def pendingWrites(self):
+        """Shots captured and still being encoded or written"""
+        return self.__writer.pending
+
+    @property
+    def failedWrites(self):
+        """Shots with a file that could not be written, since the start"""
+        return self.__writer.failed
+
+    @staticmethod
+    def __close(value, reference, tolerance):
+        """Whether value is within tolerance, relative, of reference, element by element for sequences"""
+        if isinstance(value, (tuple, list)):
+            return isinstance(reference, (tuple, list)) and len(value) == len(reference) and \
+                all(Cam.__close(a, b, tolerance) for a, b in zip(value, reference))
+        return abs(value - reference) <= tolerance * max(abs(value), abs(reference), 1e-6)
+
+    def __settle(self):
+        """
+        Wait, with the lock held, until the frames after a mode switch are good to keep, instead
+        of a fixed second. The controls set by hand, exposure and gain with AE off, colour gains
+        with AWB off, must have reached the frame, and what AE and AWB still drive, ExposureTime,
+        AnalogueGain and Lux or ColourGains, must have moved less than the tolerance for
+        stable_frames frames in a row, with AeLocked set where the pipeline reports it. With both
+        off that is the frame carrying the manual values, there is nothing to converge.
+        """
+        settings = self.__config['camera']['convergence']
+        tolerance = settings['tolerance']
+        start = time.perf_counter()
+        aeOn = self.__controls.get('AeEnable', True)
+        awbOn = self.__controls.get('AwbEnable', True)
+        manual = (() if aeOn else ('ExposureTime', 'AnalogueGain')) + (() if awbOn else ('ColourGains',))
+        targets = {name: self.__controls[name] for name in manual if self.__controls.get(name)}
+        watched = (('ExposureTime', 'AnalogueGain', 'Lux') if aeOn else ()) + (('ColourGains',) if awbOn else ())
+        previous, stable, settled = None, 0, False
+        while not settled and time.perf_counter() - start < settings['timeout']:
+            metadata = self.__cam.capture_metadata()
+            reached = all(name in metadata and self.__close(metadata[name], value, tolerance)
+                          for name, value in targets.items())
+            values = [metadata[name] for name in watched if name in metadata]
+            if previous is not None and self.__close(values, previous, tolerance):
+                stable += 1
+            else:
+                stable = 0
+            previous = values
+            settled = reached and (not watched or stable >= settings['stable_frames'] and
+                                   (not aeOn or metadata.get('AeLocked', True)))
+        if not settled:
+            logging.debug("Exposure not settled after {} s, capturing anyway".format(settings['timeout']))
+        SETTLE.observe(time.perf_counter() - start)
 
     def exposureCapture(self, exposeTime, width, height):
         if width == 0 or height == 0 or width > 1920 or height > 1920:
@@ -298,7 +548,7 @@ class Cam:
             self.__cam.set_controls(self.__controls)
             self.__zoom(coordinate)
             self.setManualExposure(exposeTime, 1)
-            time.sleep(1)
+            self.__settle()
             request = self.__cam.capture_request()
             frame = request.make_array("main")
             metadata = request.get_metadata()
@@ -310,11 +560,58 @@ class Cam:
 
     def stop(self):
         with self.__lock:
+            self.__streaming.clear()
             self.__cam.stop()
 
+    def setFrameRate(self, fps=None):
+        """Cap the preview frame rate through FrameDurationLimits, None for the full range of the sensor mode"""
+        if fps:
+            duration = int(1e6 / fps)
+            limits = (duration, duration)
+        else:
+            limits = self.__cam.camera_controls['FrameDurationLimits'][:2]
+        self.__cam.set_controls({'FrameDurationLimits': limits})
+
+    @property
+    def inStandby(self):
+        return self.__standby
+
+    def standby(self):
+        """
+        Stop streaming while nothing shows the preview, the sensor and the ISP go idle. The
+        configuration, its buffers and the controls are kept, so resume() only restarts the
+        stream. A recording keeps the camera streaming.
+        """
+        with self.__lock:
+            if self.__standby or self.__recording:
+                return
+            self.__streaming.clear()
+            self.__cam.stop()
+            self.__standby = True
+            self.__resumedAt = None
+        STREAMING.set(0)
+
+    def resume(self):
+        """Restart the stream stopped by standby() with the controls and the zoom it had"""
+        with self.__lock:
+            if not self.__standby:
+                return
+            self.__resumedAt = time.perf_counter()
+            self.__cam.set_controls(self.__controls)
+            self.__cam.start()
+            self.__zoom()
+            self.__standby = False
+            self.__streaming.set()
+        STREAMING.set(1)
+
     def start(self):
         with self.__lock:
             self.__cam.start()
+            self.__streaming.set()
 
     def release(self):
+        self.__running = False
+        self.__streaming.set()
+        self.__captureThread.join(1)
+        self.__writer.shutdown()
         self.__cam.close()
@@ -0,0 +1,50 @@
+import logging
+import os
+import struct
+
+# Packed frame file: magic, logical width and height, MADCTL it was drawn with, then the big-endian
+# RGB565 words exactly as they go over SPI
+HEADER = struct.Struct('<6sHHB')
+MAGIC = b'RGB565'
+
+
+def savePacked(path, pixels, width, height, madctl):
+    """Write a packed frame, through a temporary file so a power cut never leaves half a frame"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, width, height, madctl))
+        f.write(memoryview(pixels).cast('B'))
+    os.replace(temporary, path)
+
+
+def loadPacked(path, width, height):
+    """
+    Read a packed frame for a panel of width x height in either orientation.
+    Returns (width, height, madctl, pixels), None when the file is missing or does not fit.
+    """
+    try:
+        with open(path, 'rb') as f:
+            magic, frameWidth, frameHeight, madctl = HEADER.unpack(f.read(HEADER.size))
+            pixels = f.read()
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or {frameWidth, frameHeight} != {width, height} or len(pixels) != frameWidth * frameHeight * 2:
+        logging.warning("{} is not a packed {}x{} frame".format(path, width, height))
+        return None
+    return frameWidth, frameHeight, madctl, pixels
+
+
+def showPacked(transport, frame):
+    """Send a frame from loadPacked to an initialized panel through an lcdTransport"""
+    width, height, madctl, pixels = frame
+    transport.command(0x36)
+    transport.data((madctl,))
+    transport.command(0x2A)
+    transport.data((0, 0, (width - 1) >> 8, (width - 1) & 0xff))
+    transport.command(0x2B)
+    transport.data((0, 0, (height - 1) >> 8, (height - 1) & 0xff))
+    transport.command(0x2C)
+    transport.write(pixels)
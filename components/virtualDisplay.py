@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+
+import cv2
+import numpy
+
+from components.lcd20 import Lcd
+from components.lcdTransport import FramebufferTransport
+
+
+class VirtualLcd(Lcd):
+    """
+    An Lcd without the panel, for running the whole UI on a machine without
+    the ST7789. Frames go through the same packing, diffing and rotation as on
+    the device into a FramebufferTransport, and what the panel would show is
+    written to a memory-mapped raw framebuffer file. A json file with the same
+    name plus ".json" describes its layout for viewers such as
+    tools/framebufferView.py.
+
+    Args:
+        path (str): Raw framebuffer file, landscape, rows top to bottom.
+        pixelFormat (str): "rgb565" for big-endian words as sent to the panel, or "rgb888".
+        snapshotPath (str): Directory for a PNG per dumped frame, None to disable.
+        videoPath (str): MJPG AVI file the dumped frames are encoded into, None to disable.
+        everyNth (int): Dump only every Nth frame shown, so dumping does not become the bottleneck.
+        fps (float): Frame rate written into the video header.
+        width, height, rotation and the tuning arguments of Lcd.
+
+    Attributes:
+        frameCount (int): Frames shown so far.
+        dumpCount (int): Frames dumped so far.
+    """
+
+    def __init__(self, path='./pict/framebuffer.raw', pixelFormat='rgb565', snapshotPath=None, videoPath=None,
+                 everyNth=1, fps=30, width=320, height=240, **kwargs):
+        if pixelFormat not in ('rgb565', 'rgb888'):
+            raise ValueError("pixelFormat must be rgb565 or rgb888")
+        self.__framebuffer = FramebufferTransport(width, height)
+        super().__init__(width, height, transport=self.__framebuffer, **kwargs)
+        self.__pixelFormat = pixelFormat
+        self.__snapshotPath = snapshotPath
+        self.__videoPath = videoPath
+        self.__everyNth = max(1, int(everyNth))
+        self.__fps = fps
+        self.__video = None
+        self.frameCount = 0
+        self.dumpCount = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if snapshotPath:
+            os.makedirs(snapshotPath, exist_ok=True)
+        if pixelFormat == 'rgb565':
+            self.__file = numpy.memmap(path, numpy.dtype('>u2'), 'w+', shape=(height, width))
+        else:
+            self.__file = numpy.memmap(path, numpy.uint8, 'w+', shape=(height, width, 3))
+        with open(path + '.json', 'w') as f:
+            json.dump({'width': width, 'height': height, 'format': pixelFormat}, f)
+
+    def showImage(self, img):
+        super().showImage(img)
+        self.frameCount += 1
+        if self.frameCount % self.__everyNth == 0:
+            self.__dump()
+
+    def clear(self):
+        super().clear()
+        self.__dump()
+
+    def __dump(self):
+        self.flush()
+        self.dumpCount += 1
+        if self.__pixelFormat == 'rgb565':
+            # Rotation 0 view of the portrait panel memory, see FramebufferTransport.image
+            self.__file[:] = self.__framebuffer.display[:, ::-1].T
+        else:
+            self.__file[:] = self.__framebuffer.image[..., ::-1]
+        if not (self.__snapshotPath or self.__videoPath):
+            return
+
+        image = self.__framebuffer.image
+        if self.__snapshotPath:
+            cv2.imwrite(os.path.join(self.__snapshotPath, 'frame{:06d}.png'.format(self.dumpCount)), image)
+        if self.__videoPath:
+            if self.__video is None:
+                self.__video = cv2.VideoWriter(
+                    self.__videoPath,
+                    cv2.VideoWriter_fourcc(*'MJPG'),
+                    self.__fps,
+                    (image.shape[1], image.shape[0])
+                )
+            self.__video.write(image)
+
+    @property
+    def statistics(self):
+        """Transport counters plus frames shown and dumped"""
+        statistics = self.__framebuffer.snapshot()
+        statistics.update(frames=self.frameCount, dumped=self.dumpCount)
+        return statistics
+
+    def moduleExit(self):
+        logging.debug("virtual display {}".format(self.statistics))
+        self.__file.flush()
+        if self.__video is not None:
+            self.__video.release()
+            self.__video = None
+        super().moduleExit()
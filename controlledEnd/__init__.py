@@ -1,5 +1,25 @@
-from .cameraControlledEnd import CameraControlledEnd
+import importlib
+
 from .controlledEnd import ControlledEnd
-from .galleryControlledEnd import GalleryControlledEnd
-from .menuControlledEnd import MenuControlledEnd
-from .systemMonitor import SystemMonitor
\ No newline at end of file
+from .controlledEndAdapter import ControlledEndAdapter
+from .lazyControlledEnd import LazyControlledEnd
+
+# The views pull in the camera stack, psutil and the I2C drivers, they are imported on first access
+_VIEWS = {
+    'CameraControlledEnd': '.cameraControlledEnd',
+    'GalleryControlledEnd': '.galleryControlledEnd',
+    'MenuControlledEnd': '.menuControlledEnd',
+    'SystemMonitor': '.systemMonitor',
+}
+
+
+def __getattr__(name):
+    if name in _VIEWS:
+        value = getattr(importlib.import_module(_VIEWS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_VIEWS))
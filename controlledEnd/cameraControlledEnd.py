@@ -3,18 +3,20 @@ import os
 import queue
 import re
 import subprocess
+import threading
 import time
 import typing
 
 import cv2
 import numpy
-import psutil
 
 import frameDecorator
-from components import MAX17048, picam2, led, configLoader
-from utils import SlidingWindowFilter, Hdr
+from components import picam2, led, configLoader
+from utils import SlidingWindowFilter, Hdr, metrics, exceptionRecorder
 from . import controlledEnd
 
+DECORATE = metrics.registry.histogram('camera.decorate')
+
 
 class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
     """
@@ -26,19 +28,20 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         __barChart (BarChart): Frame decorator for displaying bar charts.
         __toast (Toast): Frame decorator for displaying toast messages.
         __decorator (SimpleText): Frame decorator for displaying text overlays.
-        __busy (Busy): Frame decorator for busy/processing indication.
+        __busy (Busy): Frame decorator for busy/processing indication, with the number of shots still being written.
         __hist (Hist2): Frame decorator for histogram display.
         __showHist (bool): Flag to show/hide histogram.
-        __isBusy (bool): Indicates if the camera is busy processing.
+        __isBusy (bool): Indicates if the camera is capturing a photo.
         __mfassist (bool): Manual focus assist flag.
+        __idle (bool): Whether the preview is idling, histogram and focus assist are skipped.
         __isHdrProcessing (bool): HDR processing flag.
         __decorateEnable (bool): Enables/disables UI decorations.
         __zoomHold (bool): Indicates if zoom is being adjusted.
         __brightHold (bool): Indicates if brightness is being adjusted.
-        __rotate (int): Frame rotation angle.
         __recordTimestamp (float or None): Timestamp for video recording.
+        __countdown (float or None): time.monotonic() the self-timer fires at.
+        __burstStop (threading.Event or None): Stops the burst taken while the shutter is held.
         __option (dict): Camera options/settings.
-        __m (Max17048): Battery monitor instance.
         __filter (SlidingWindowFilter): Filter for smoothing frame quality.
         __frameList (queue.Queue): Queue for frame buffering.
     Methods:
@@ -53,8 +56,14 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         leftReleaseAction(): Handles the action when the left button is released.
         rightPressAction(): Handles the action when the right button is pressed (zoom in).
         rightReleaseAction(): Handles the action when the right button is released.
-        shutterPressAction(): Handles the action when the shutter button is pressed (capture photo).
-        shutterLongPressAction(): Handles the action when the shutter button is long-pressed (start/stop video recording).
+        shutterPressAction(): Handles the action when the shutter button is pressed (capture photo, or start the self-timer).
+        __countdownTick(): Blinks the self-timer and captures when it runs out, called by mainLoop.
+        __capture(): Captures and saves a photo with the current settings.
+        shutterLongPressAction(): Handles the action when the shutter button is long-pressed (start/stop video recording, or shoot while held in the hold burst mode).
+        shutterReleaseAction(): Stops the burst taken while the shutter is held.
+        __burst(count, stop): Takes a burst on a thread of its own, the view keeps running.
+        __shotPath(directory, extension): A new file name, unique even for shots within a second.
+        __resolution(): Width and height of the resolution option.
         squarePressAction(): Handles the action when the square button is pressed (menu).
         circlePressAction(): Toggles UI decorations.
         crossPressAction(): Placeholder for cross button action.
@@ -67,8 +76,9 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         rotaryEncoderCounterClockwise(): Placeholder for rotary encoder counter-clockwise action.
         rotaryEncoderSelect(): Placeholder for rotary encoder select action.
         onEnter(lastID): Handles actions when entering this control end.
-        active(): Activates the camera preview.
-        inactive(): Deactivates the camera preview.
+        active(): Resumes the camera stream.
+        inactive(): Puts the camera in standby while another view is shown.
+        onIdle(), onWake(): Slow the preview down and drop the histogram and focus assist while idle.
         mainLoop(): Main loop for processing and yielding camera frames with decorations and overlays.
     Usage:
         This class is intended to be used as part of a camera control system, providing both hardware and UI interaction logic for camera operation, including photo capture, video recording, and real-time frame processing.
@@ -108,14 +118,21 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         self.__showHist = False
         self.__isBusy = False
         self.__mfassist = False
+        # No input for a while, the preview runs slower and without the costly overlays
+        self.__idle = False
         self.__isHdrProcessing = False
         self.__decorateEnable = False
         self.__zoomHold = False
         self.__brightHold = False
-        self.__rotate = 0
         self.__recordTimestamp = None
+        self.__countdown = None
+        # Set to stop a burst taken while the shutter is held
+        self.__burstStop = None
+        self.__lastShotName = None
+        self.__shotIndex = 0
+        # Failed shots of the writer already reported with a toast
+        self.__failedSeen = 0
         self.__option: typing.Dict[typing.Dict] = None
-        self.__m = MAX17048.MAX17048()
         self.__filter = SlidingWindowFilter(10)
         self.__frameList = queue.Queue(maxsize=5)
 
@@ -146,7 +163,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
     def upPressAction(self):
         if self.__decorateEnable:
             self.__decorator.previousPage()
-            time.sleep(0.3)
         else:
             if self.__isHdrProcessing:
                 return
@@ -157,7 +173,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
                 self.__brightness += 0.01
             self.__toast.setText("BRT {}".format(int(self.__brightness * 100)))
             self.brightness(self.__brightness)
-            time.sleep(0.05)
 
     def upReleaseAction(self):
         self.__brightHold = False
@@ -165,7 +180,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
     def downPressAction(self):
         if self.__decorateEnable:
             self.__decorator.nextPage()
-            time.sleep(0.3)
         else:
             if self.__isHdrProcessing:
                 return
@@ -176,7 +190,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
                 self.__brightness -= 0.01
             self.__toast.setText("BRT {}".format(int(self.__brightness * 100)))
             self.brightness(self.__brightness)
-            time.sleep(0.05)
 
     def downReleaseAction(self):
         self.__brightHold = False
@@ -191,7 +204,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
             self.__zoom -= 0.2
         self.__toast.setText("X {}".format(round(self.__zoom, 1)))
         self.zoom(self.__zoom)
-        time.sleep(0.05)
 
     def leftReleaseAction(self):
         self.__zoomHold = False
@@ -203,7 +215,6 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         self.__zoom += 0.2
         self.__toast.setText("X {}".format(round(self.__zoom, 1)))
         self.zoom(self.__zoom)
-        time.sleep(0.05)
 
     def rightReleaseAction(self):
         self.__zoomHold = False
@@ -213,64 +224,120 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
             self.stopRecording()
             led.off(led.blue)
             self.__recordTimestamp = None
+        elif self.__countdown is not None:
+            # A second press cancels the self-timer
+            self.__countdown = None
+            led.off(led.green)
+        elif self.__findOptionByID('delay'):
+            # Counted down by mainLoop, the preview keeps running meanwhile
+            self.__countdown = time.monotonic() + self.__findOptionByID('delay')
         else:
-            try:
-                width, height = tuple(
-                    self.__findOptionByID('resolution')['value'])
-            except ValueError:
-                width, height = 0, 0
-
-            delay = self.__findOptionByID('delay')
-            for i in range(delay):
-                if delay - i <= 3:
-                    led.toggleState(led.green)
-                    time.sleep(0.5)
-                    led.toggleState(led.green)
-                    time.sleep(0.5)
-                else:
-                    led.toggleState(led.green)
-                    time.sleep(1)
-            self.__isBusy = True
-            led.on(led.green)
-            self.__toast.setText("Processing")
-            path = os.path.join(
-                self.__config['camera']['path'], "{}".format(int(time.time())))
-            fmat = self.__findOptionByID('pict format')
-            self.saveFrame(
-                filePath=path,
-                fmat=fmat,
-                width=int(width),
-                height=int(height),
-                rotate=self.__rotate,
-                saveMetadata=self.__findOptionByID("save metadata"),
-                saveRaw=self.__findOptionByID("dng enable")
-            )
-            if self.__findOptionByID('watermark'):
-                frame = cv2.imread('{}.{}'.format(path, fmat))
-                frameDecorator.WaterMark(
-                    int(width), int(height)).decorate(frame)
-                cv2.imwrite('{}.{}'.format(path, fmat), frame)
+            self.__capture()
 
+    def __countdownTick(self):
+        remaining = self.__countdown - time.monotonic()
+        if remaining <= 0:
+            self.__countdown = None
+            self.__capture()
+            return
+        # Blink once a second, twice a second for the last three
+        phase = remaining * 2 if remaining <= 3 else remaining
+        if int(phase) % 2:
+            led.on(led.green)
+        else:
             led.off(led.green)
-            self.__isBusy = False
+        self.__toast.setText(str(int(remaining) + 1))
+
+    def __shotPath(self, directory, extension=''):
+        now = time.time()
+        name = '{}_{:03d}'.format(time.strftime('%Y%m%d_%H%M%S', time.localtime(now)), int(now * 1000) % 1000)
+        if name == self.__lastShotName:
+            self.__shotIndex += 1
+        else:
+            self.__lastShotName, self.__shotIndex = name, 0
+        if self.__shotIndex:
+            name = '{}_{}'.format(name, self.__shotIndex)
+        return os.path.join(directory, name + extension)
+
+    def __burstCount(self):
+        """Frames the shutter takes, 1 without burst, 0 to shoot while it is held"""
+        mode = self.__findOptionByID('burst')['value']
+        if not mode:
+            return 1
+        return max(mode, 0)
+
+    def __resolution(self):
+        """Width and height of the resolution option, 0, 0 for the full sensor when it has no usable value"""
+        try:
+            width, height = self.__findOptionByID('resolution')['value']
+        except (LookupError, TypeError, ValueError):
+            return 0, 0
+        return int(width), int(height)
+
+    def __shotSettings(self):
+        width, height = self.__resolution()
+        # Drawn on the captured frame before the writer encodes it, the photo is encoded once
+        watermark = (lambda frame: frameDecorator.WaterMark(frame.shape[1], frame.shape[0]).decorate(frame)) \
+            if self.__findOptionByID('watermark') else None
+        return dict(
+            fmat=self.__findOptionByID('pict format'),
+            width=width,
+            height=height,
+            rotate=self._rotation,
+            saveMetadata=self.__findOptionByID("save metadata"),
+            saveRaw=self.__findOptionByID("dng enable"),
+            decorate=watermark
+        )
+
+    def __capture(self):
+        if self.__isBusy:
+            return
+        count = self.__burstCount()
+        if count > 1:
+            self.__burst(count)
+            return
+
+        self.__isBusy = True
+        led.on(led.green)
+        self.__toast.setText("Processing")
+        self.saveFrame(filePath=self.__shotPath(self.__config['camera']['path']), **self.__shotSettings())
+
+        led.off(led.green)
+        self.__isBusy = False
+
+    def __burst(self, count, stop=None):
+        """
+        The capture holds the camera for the whole burst, it runs on a thread of its own so the
+        view keeps drawing and gets the shutter release.
+        """
+        self.__isBusy = True
+        led.on(led.green)
+        self.__toast.setText("Burst")
+        path = self.__shotPath(self.__config['camera']['path'])
+        settings = self.__shotSettings()
+
+        def run():
+            taken = 0
+            try:
+                taken = self.burst(path, count, stop=stop, **settings)
+            finally:
+                led.off(led.green)
+                self.__toast.setText("Burst {}".format(taken))
+                self.__isBusy = False
+
+        threading.Thread(target=exceptionRecorder()(run), name='burst', daemon=True).start()
 
     def shutterLongPressAction(self):
         if self.__isBusy or self.__isHdrProcessing:
             return
-        if self.__recordTimestamp is None:
-            try:
-                width, height = tuple(
-                    self.__findOptionByID('resolution').split('x'))
-            except ValueError:
-                width, height = 0, 0
+        if self.__recordTimestamp is None and self.__burstCount() == 0:
+            self.__burstStop = threading.Event()
+            self.__burst(0, self.__burstStop)
+        elif self.__recordTimestamp is None:
+            width, height = self.__resolution()
             self.startRecording(
-                int(width), int(height),
-                '{}'.format(
-                    os.path.join(
-                        self.__config['camera']['video_path'],
-                        str(int(time.time())) + '.mp4'
-                    )
-                )
+                width, height,
+                self.__shotPath(self.__config['camera']['video_path'], '.mp4')
             )
             led.on(led.blue)
             self.__recordTimestamp = time.time()
@@ -279,6 +346,11 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
             led.off(led.blue)
             self.__recordTimestamp = None
 
+    def shutterReleaseAction(self):
+        if self.__burstStop is not None:
+            self.__burstStop.set()
+            self.__burstStop = None
+
     def squarePressAction(self):
         if self.__recordTimestamp is None and not self.__isBusy:
             self._irq('MenuControlledEnd')
@@ -362,21 +434,44 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
         if not os.path.exists(self.__config['camera']['path']) or not os.path.isdir(self.__config['camera']['path']):
             os.mkdir(self.__config['camera']['path'])
         self._msgSender(self._id, 'MenuControlledEnd', self._id)
-        self.loadSettings()
+        # The options arrive with the menu's reply, which calls msgReceiver
+        if self.__option is not None:
+            self.loadSettings()
 
     def active(self):
-        self.start()
+        self.resume()
 
     def inactive(self):
-        self.stop()
+        self.standby()
+
+    def onIdle(self):
+        # A recording keeps its frame rate and overlays
+        if self.__recordTimestamp is not None:
+            return
+        self.__idle = True
+        self.setFrameRate(self.__config['idle']['preview_fps'])
+
+    def onWake(self):
+        self.__idle = False
+        self.setFrameRate(None)
 
     def mainLoop(self):
         for index, frame in enumerate(self.preview()):
+            start = time.perf_counter()
+            if self.__countdown is not None:
+                self.__countdownTick()
+            if self._rotation:
+                # The panel rotates in hardware, keep the preview aligned with the sensor
+                frame = numpy.ascontiguousarray(
+                    numpy.rot90(frame, self._rotation // 90))
             self.__filter.addData(self.frameQuality)
             self.__barChart.addData(int(self.__filter.calc()))
+            mfassist = self.__mfassist and not self.__idle
 
-            if self.__mfassist:
-                gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+            if mfassist:
+                gray = self.luma
+                if self._rotation:
+                    gray = numpy.ascontiguousarray(numpy.rot90(gray, self._rotation // 90))
                 blurred = cv2.GaussianBlur(gray, (5, 5), 0)
                 edges = cv2.Canny(
                     blurred,
@@ -395,10 +490,15 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
                         colorfulEdges[edges != 0] = (0, 255, 0)
 
             if self.__decorateEnable and not self.__zoomHold and self.__recordTimestamp is None:
-                self.__barChart.decorate(frame, rotate=self.__rotate)
-                self.__decorator.decorate(frame, rotate=self.__rotate)
-            if self.__isBusy:
-                self.__busy.decorate(frame, self.__rotate)
+                self.__barChart.decorate(frame)
+                self.__decorator.decorate(frame)
+            pending = self.pendingWrites
+            if self.__isBusy or pending:
+                self.__busy.decorate(frame, pending)
+            failed = self.failedWrites
+            if failed != self.__failedSeen:
+                self.__toast.setText("{} not saved".format(failed - self.__failedSeen))
+                self.__failedSeen = failed
 
             if self.__recordTimestamp is not None and not self.__zoomHold:
                 millis = (time.time() - self.__recordTimestamp) * 1000
@@ -411,17 +511,18 @@ class CameraControlledEnd(controlledEnd.ControlledEnd, picam2.Cam):
                     )
                 )
             if self.__zoomHold:
-                self.__toast.decorate(frame, self.__rotate)
+                self.__toast.decorate(frame)
             if self.__brightHold:
-                self.__toast.decorate(frame, self.__rotate)
+                self.__toast.decorate(frame)
             if self.__toast.isUpdate:
-                self.__toast.decorate(frame, self.__rotate)
+                self.__toast.decorate(frame)
             if self.__isHdrProcessing:
-                self.__toast.decorate(frame, self.__rotate)
-            if self.__showHist:
+                self.__toast.decorate(frame)
+            if self.__showHist and not self.__idle:
                 self.__hist.decorate(frame)
 
-            if self.__mfassist and edges.any():
+            if mfassist and edges.any():
                 frame = cv2.addWeighted(frame, 1, colorfulEdges, 1.0, 0)
 
+            DECORATE.observe(time.perf_counter() - start)
             yield frame
@@ -1,4 +1,6 @@
 import abc
+import threading
+import time
 from pydoc import doc
 
 
@@ -9,6 +11,16 @@ class ControlledEnd(abc.ABC):
     This class defines the interface for handling various button presses, rotary encoder actions, and communication functions.
     Subclasses must implement the abstract methods to provide specific behavior for each action.
 
+    Frames are pulled from mainLoop() by the controller, which calls waitForRefresh() after each one. A view with
+    _maxFps left at None is free running, like the camera preview. A view that sets _maxFps only gets pulled again
+    after it called invalidate(), at most _maxFps times a second, or every 1 / _idleFps seconds when _idleFps is set,
+    so static screens cost no CPU.
+
+    Handlers never run on an input thread and must not sleep to rate limit themselves. The controller calls
+    the press action of a direction button again while it is held, faster the longer it is held. For the circle,
+    square, cross and shutter buttons, a view that overrides the long press action gets its press action on a
+    short release instead of on the press, and the long press action once the button was held long enough.
+
     Args:
         _id: Unique identifier for the controlled end instance.
 
@@ -16,6 +28,11 @@ class ControlledEnd(abc.ABC):
         _id (Any): The unique identifier for the instance.
         _irq (callable or None): Interrupt request handler.
         _msgSender (callable or None): Message sender function.
+        _rotation (int): Clockwise display rotation the frames are drawn for, 0, 90, 180 or 270.
+        _scroll (tuple or None): (top, bottom, dy) when rows [top, bottom) of the frame last yielded
+            show the previous content moved up by dy rows, lets the display scroll in hardware.
+        _maxFps (float or None): Most frames per second pulled after invalidate(), None to pull frames freely.
+        _idleFps (float or None): Frames per second pulled without invalidate(), for content that changes by itself.
 
     Methods:
         centerPressAction(): Handle center button press (abstract).
@@ -29,27 +46,51 @@ class ControlledEnd(abc.ABC):
         rightPressAction(): Handle right button press (abstract).
         rightReleaseAction(): Handle right button release.
         circlePressAction(): Handle circle button press (abstract).
+        circleReleaseAction(): Handle circle button release.
+        circleLongPressAction(): Handle circle button held down.
         squarePressAction(): Handle square button press (abstract).
+        squareReleaseAction(): Handle square button release.
+        squareLongPressAction(): Handle square button held down.
         crossPressAction(): Handle cross button press (abstract).
+        crossReleaseAction(): Handle cross button release.
+        crossLongPressAction(): Handle cross button held down.
         shutterPressAction(): Handle shutter button press (abstract).
+        shutterReleaseAction(): Handle shutter button release.
+        shutterLongPressAction(): Handle shutter button held down.
         rotaryEncoderClockwise(): Handle rotary encoder clockwise rotation (abstract).
         rotaryEncoderCounterClockwise(): Handle rotary encoder counter-clockwise rotation (abstract).
         rotaryEncoderSelect(): Handle rotary encoder select action (abstract).
+        rotaryEncoderRotate(ticks, speed): Handle all detents turned while the previous turn was handled.
         msgReceiver(sender, msg): Handle incoming messages (abstract).
         msgSender(func): Set the message sender function.
         irq(func): Set the interrupt request handler.
         mainLoop(): Main execution loop (abstract).
         onExit(): Actions to perform on exit.
         onEnter(lastID): Actions to perform on enter.
-        active(): Actions to perform when activated.
-        inactive(): Actions to perform when deactivated.
+        active(): Actions to perform when activated, called before onEnter when the view is switched to.
+        inactive(): Actions to perform when deactivated, called after onExit, release hardware the view
+            only needs while shown.
+        onIdle(): Called on the shown view after a while without input, drop to a cheaper preview.
+        onWake(): Called on the shown view by the first input after onIdle, before that input is handled.
         id: Property to get the unique identifier.
+        rotation: Property to get the display rotation, frames are drawn upright for it.
+        scroll: Property to get the scroll hint of the frame last yielded.
+        maxFps: Property to get the frame rate cap, None when free running.
+        invalidate(): Ask the controller for a new frame, callable from any thread.
+        waitForRefresh(): Block the controller until the next frame is due.
     """
 
     def __init__(self, _id):
         self._id = _id
         self._irq = None
         self._msgSender = None
+        self._rotation = 0
+        self._scroll = None
+        self._maxFps = None
+        self._idleFps = None
+        self._refresh = threading.Condition()
+        self._invalidated = True
+        self._lastRefresh = 0.0
 
     """---Multi Direction Button Start---"""
 
@@ -90,15 +131,39 @@ class ControlledEnd(abc.ABC):
     def circlePressAction(self):
         pass
 
+    def circleReleaseAction(self):
+        pass
+
+    def circleLongPressAction(self):
+        pass
+
     def squarePressAction(self):
         pass
 
+    def squareReleaseAction(self):
+        pass
+
+    def squareLongPressAction(self):
+        pass
+
     def crossPressAction(self):
         pass
 
+    def crossReleaseAction(self):
+        pass
+
+    def crossLongPressAction(self):
+        pass
+
     def shutterPressAction(self):
         pass
 
+    def shutterReleaseAction(self):
+        pass
+
+    def shutterLongPressAction(self):
+        pass
+
     """---Multi Function Button End---"""
 
     """---Rotary Encoder Start---"""
@@ -112,6 +177,17 @@ class ControlledEnd(abc.ABC):
     def rotaryEncoderSelect(self):
         pass
 
+    def rotaryEncoderRotate(self, ticks, speed):
+        """
+        Detents turned since the last call, positive clockwise, and the turning speed in detents per
+        second. Override to apply a fast turn at once, by default every detent is handed on by itself.
+        """
+        for _ in range(abs(ticks)):
+            if ticks > 0:
+                self.rotaryEncoderClockwise()
+            else:
+                self.rotaryEncoderCounterClockwise()
+
     """---Rotary Encoder End---"""
 
     """---Communication Function Start---"""
@@ -131,6 +207,30 @@ class ControlledEnd(abc.ABC):
     def mainLoop(self):
         pass
 
+    def invalidate(self):
+        with self._refresh:
+            self._invalidated = True
+            self._refresh.notify_all()
+
+    def waitForRefresh(self):
+        if self._maxFps is None:
+            return
+        with self._refresh:
+            while True:
+                now = time.monotonic()
+                earliest = self._lastRefresh + 1 / self._maxFps
+                if self._invalidated:
+                    due = earliest
+                elif self._idleFps:
+                    due = max(earliest, self._lastRefresh + 1 / self._idleFps)
+                else:
+                    due = None
+                if due is not None and now >= due:
+                    break
+                self._refresh.wait(None if due is None else due - now)
+            self._invalidated = False
+            self._lastRefresh = time.monotonic()
+
     def onExit(self):
         pass
 
@@ -143,10 +243,28 @@ class ControlledEnd(abc.ABC):
     def inactive(self):
         pass
 
+    def onIdle(self):
+        pass
+
+    def onWake(self):
+        pass
+
     @property
     def id(self):
         return self._id
 
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @property
+    def scroll(self):
+        return self._scroll
+
+    @property
+    def maxFps(self):
+        return self._maxFps
+
 
 if __name__ == '__main__':
     print(ControlledEnd.__doc__)
@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import exceptionRecorder
+from .controlledEnd import ControlledEnd
+from .lazyControlledEnd import LazyControlledEnd
+
+
+class ControlledEndAdapter():
+    """
+    Runs a ControlledEnd behind a mailbox for an asyncio controller. Every call into the controlled end, input
+    handlers, messages, onEnter/onExit and the next() of its mainLoop, is executed on one worker thread owned by
+    the adapter, in the order it was posted. The controlled end keeps its blocking, synchronous API and never sees
+    two of its methods run at the same time, while the event loop never waits on it.
+
+    A LazyControlledEnd is built on the worker thread by the first call that names one of its methods, or by
+    build(), so a slow constructor never blocks the loop or the other controlled ends.
+
+    Args:
+        widget (ControlledEnd or LazyControlledEnd): The controlled end to run.
+        loop (asyncio.AbstractEventLoop): The controller's event loop.
+
+    Attributes:
+        widget (ControlledEnd or None): The controlled end, None until a lazy one is built.
+        id (str): Its id.
+
+    Methods:
+        post(function, *args): Queue a call, from any thread, failures are recorded and swallowed.
+        call(function, *args, record=False): Queue a call from the loop and await its result, failures are
+            recorded and give None with record.
+        build(): Await the construction of a lazy controlled end.
+        built: Whether the controlled end exists yet.
+        invalidate(): Invalidate the controlled end, if it exists.
+        overrides(name): Whether the controlled end overrides a ControlledEnd method, without building it.
+        next(generator): Await the next frame of a mainLoop generator, None when it returned.
+        waitForRefresh(): Await the controlled end's waitForRefresh without taking the worker thread.
+        run(): The mailbox task, started by the controller.
+        close(): Stop the worker thread.
+
+    A function given as a string names a method of the controlled end, looked up on the worker thread.
+    """
+
+    def __init__(self, widget, loop):
+        if isinstance(widget, LazyControlledEnd):
+            self.__lazy = widget
+            self.widget = widget.widget
+        else:
+            self.__lazy = None
+            self.widget = widget
+        self.id = widget.id
+        self.__loop = loop
+        self.__mailbox = asyncio.Queue()
+        self.__executor = ThreadPoolExecutor(1, thread_name_prefix=widget.id)
+        # waitForRefresh only blocks on the widget's condition, it gets its own thread so
+        # handlers that call invalidate() are never queued behind it
+        self.__waiter = ThreadPoolExecutor(1, thread_name_prefix=widget.id + '-refresh')
+
+    def __build(self):
+        if self.widget is None:
+            self.widget = self.__lazy.build()
+        return self.widget
+
+    def __resolve(self, function, args):
+        if not isinstance(function, str):
+            return function, args
+
+        def method(name, *args):
+            return getattr(self.__build(), name)(*args)
+        return method, (function,) + args
+
+    def post(self, function, *args):
+        function, args = self.__resolve(function, args)
+        self.__loop.call_soon_threadsafe(self.__mailbox.put_nowait, (exceptionRecorder()(function), args, None))
+
+    def call(self, function, *args, record=False):
+        function, args = self.__resolve(function, args)
+        if record:
+            function = exceptionRecorder()(function)
+        future = self.__loop.create_future()
+        self.__mailbox.put_nowait((function, args, future))
+        return future
+
+    async def build(self):
+        return await self.call(self.__build)
+
+    @property
+    def built(self):
+        return self.widget is not None
+
+    def invalidate(self):
+        if self.widget is not None:
+            self.widget.invalidate()
+
+    def overrides(self, name):
+        # A lazy controlled end answers from its class, the press deferral must not depend on it being built
+        viewClass = type(self.widget) if self.widget is not None else self.__lazy.viewClass
+        return getattr(viewClass, name, None) not in (None, getattr(ControlledEnd, name))
+
+    async def next(self, generator):
+        return await self.call(next, generator, None)
+
+    async def waitForRefresh(self):
+        await self.__loop.run_in_executor(self.__waiter, self.widget.waitForRefresh)
+
+    async def run(self):
+        while True:
+            function, args, future = await self.__mailbox.get()
+            try:
+                result = await self.__loop.run_in_executor(self.__executor, function, *args)
+            except Exception as e:
+                # Posted calls record their own failures, only awaited ones can raise here
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.cancelled():
+                    future.set_result(result)
+
+    def close(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        self.__waiter.shutdown(wait=False, cancel_futures=True)
@@ -1,6 +1,4 @@
-import queue
 import typing
-from time import sleep
 
 import numpy as np
 
@@ -15,11 +13,10 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
         pictPath = pictPath if pictPath.endswith('/') else pictPath + '/'
         mediaBrowser.MediaBrowser.__init__(self, pictPath, width, height)
         self.__width, self.__height = width, height
-        self.__direction = 0
         self.__option: typing.Dict[typing.Dict] = None
-        self.__frameList = queue.Queue()
+        self.__latest = None
+        self._maxFps = 30
         self.__busy = frameDecorator.Busy()
-        self.__rotate = 0
         self.__currentFrame = np.zeros((self.__width, self.__height, 3), np.uint8)
         self.__hist = frameDecorator.Hist2()
         self.__rawFrame = None
@@ -67,7 +64,6 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             return
         self.previous()
         self.__refreshFrame()
-        sleep(0.2)
 
     def downPressAction(self):
         if self.__empty:
@@ -76,7 +72,6 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             return
         self.next()
         self.__refreshFrame()
-        sleep(0.2)
 
     def leftPressAction(self):
         if self.__empty:
@@ -85,7 +80,6 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             return
         self.previous()
         self.__refreshFrame()
-        sleep(0.2)
 
     def rightPressAction(self):
         if self.__empty:
@@ -94,7 +88,6 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             return
         self.next()
         self.__refreshFrame()
-        sleep(0.2)
 
     def __addHist(self):
         if self.__findOptionByID("show hist"):
@@ -159,7 +152,7 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
     def __refreshFrame(self):
         if self.__currentFrame is not None:
             self.__busy.decorate(self.__currentFrame)
-            self.__frameList.put(self.__currentFrame)
+            self.__show(self.__currentFrame)
         try:
             self.__rawFrame = self.getCurrentFrame()
         except FileExistsError:
@@ -168,18 +161,23 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             return
         self.__currentFrame = self.__rawFrame.copy()
         self.__addHist()
-        self.__frameList.put(self.__currentFrame)
+        self.__show(self.__currentFrame)
+
+    def __show(self, frame):
+        self.__latest = frame
+        self.invalidate()
 
     def mainLoop(self):
         while True:
-            pict = self.__frameList.get(block=True)
+            pict = self.__latest
             if self.__simpleTextEnable:
+                pict = pict.copy()
                 self.__decorator.decorate(pict)
-            yield np.rot90(pict, -self.__rotate // 90)
+            yield pict
 
 
     def onExit(self):
-        self.__frameList.put(frameDecorator.Warining().decorate("Empty"))
+        self.__show(frameDecorator.Warining().decorate("Empty"))
 
     def onEnter(self, lastID):
         try:
@@ -191,4 +189,4 @@ class GalleryControlledEnd(controlledEnd.ControlledEnd, mediaBrowser.MediaBrowse
             self.__refreshFrame()
         except FileExistsError:
             self.__empty = True
-            self.__frameList.put(frameDecorator.Warining().decorate("Empty"))
+            self.__show(frameDecorator.Warining().decorate("Empty"))
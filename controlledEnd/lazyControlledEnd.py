@@ -0,0 +1,70 @@
+import importlib
+import threading
+
+
+class LazyControlledEnd:
+    """
+    Stand-in for a controlled end that is only constructed when it is first needed, so views the user
+    may never open do not delay the first preview frame. UniversalControl accepts it wherever it accepts
+    a ControlledEnd, the handlers given to irq() and msgSender() are passed on once it is built.
+
+    Args:
+        _id (str): Id of the controlled end the factory returns.
+        factory (callable): Builds the controlled end, called once, on the thread that first needs it.
+        viewClass (type or str): Class of the controlled end, or its name in the controlledEnd package,
+            the id by default. Only its module is imported to tell which handlers it overrides.
+
+    Attributes:
+        widget (ControlledEnd or None): The controlled end once built.
+        viewClass: Property to get the class of the controlled end, without building it.
+
+    Methods:
+        build(): Construct the controlled end if that did not happen yet and return it.
+        irq(func), msgSender(func): Remember the handlers for the controlled end.
+        id: Property to get the unique identifier.
+        built: Whether the controlled end exists yet.
+    """
+
+    def __init__(self, _id, factory, viewClass=None):
+        self._id = _id
+        self.__factory = factory
+        self.__viewClass = viewClass or _id
+        self.__irq = None
+        self.__msgSender = None
+        self.__lock = threading.Lock()
+        self.widget = None
+
+    def build(self):
+        with self.__lock:
+            if self.widget is None:
+                widget = self.__factory()
+                if widget.id != self._id:
+                    raise ValueError("factory for {} built {}".format(self._id, widget.id))
+                if self.__irq is not None:
+                    widget.irq(self.__irq)
+                if self.__msgSender is not None:
+                    widget.msgSender(self.__msgSender)
+                self.widget = widget
+            return self.widget
+
+    def irq(self, func):
+        self.__irq = func
+
+    def msgSender(self, func):
+        self.__msgSender = func
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def viewClass(self):
+        if self.widget is not None:
+            return type(self.widget)
+        if isinstance(self.__viewClass, str):
+            self.__viewClass = getattr(importlib.import_module(__package__), self.__viewClass)
+        return self.__viewClass
+
+    @property
+    def built(self):
+        return self.widget is not None
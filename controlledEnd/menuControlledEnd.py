@@ -1,7 +1,5 @@
 import json
 import math
-import queue
-import time
 import typing
 
 import cv2
@@ -36,6 +34,9 @@ class MenuControlledEnd(ControlledEnd):
         __currentOptions (list): List of currently visible menu options.
         __pageCount (int): Total number of pages in the menu.
         __currentPage (int): Index of the current page.
+        __firstRow (int): Index of the option shown in the first row.
+        __scrollMode (bool): Scroll the list one row at a time instead of paging.
+        __pendingScroll (int): Rows the list scrolled since the last frame was rendered.
         __currentIndex (int): Index of the currently selected item on the current page.
         __currentMenuID (str): ID of the current menu.
         __selectIndex (int): Index of the currently selected option for editing.
@@ -44,8 +45,8 @@ class MenuControlledEnd(ControlledEnd):
         __valueTemp: Temporary value for editing options.
         __routeList (list): Stack for tracking menu navigation history.
         __theme (dict): Color theme for the menu display.
-        __frameList (queue): Queue for storing rendered frames.
-        __direction (int): Display rotation direction.
+        __latest (tuple): Newest rendered frame and its scroll hint, None once the main loop picked it up.
+        __shown (numpy.ndarray): Frame last yielded by the main loop.
         __config (ConfigLoader): Configuration loader instance.
     Methods:
         __init__(...): Initialize the menu controller with display and menu parameters.
@@ -54,6 +55,7 @@ class MenuControlledEnd(ControlledEnd):
         setOption(key): Set the current menu options by key.
         dumpConfig(): Save the current menu configuration to file.
         __spaceCalc(): Calculate vertical spacing for menu items.
+        __scrollRows(rows), __scrollHint(): Scroll the list in scroll mode and describe it for the display.
         __drawSlideBar(frame): Draw the slide bar for page navigation.
         __genItemStartCoordinate(...): Generate coordinates for menu item rendering.
         __jumpToPrevious(): Navigate to the previous menu in the route stack.
@@ -72,10 +74,12 @@ class MenuControlledEnd(ControlledEnd):
         __optionMenu(frame): Draw the option selection menu.
         decorate(): Render the current menu state to a frame.
         __nextStep(), __previousStep(): Change the step size for numerical options.
-        __valuePlus(), __valueMinus(): Increment or decrement a numerical value.
+        __valuePlus(steps, step), __valueMinus(steps, step): Increment or decrement a numerical value.
+        __stepForSpeed(speed): Step of the edited numeral for the rotary encoder speed.
         __optionUp(), __optionDown(): Navigate through option values.
         centerPressAction(), upPressAction(), downPressAction(), leftPressAction(), rightPressAction(): Handle button press actions.
         circlePressAction(), crossPressAction(), crossLongPressAction(): Handle special button actions.
+        rotaryEncoderRotate(ticks, speed): Handle coalesced rotary encoder detents, faster turns take larger steps.
         rotaryEncoderCounterClockwise(), rotaryEncoderClockwise(), rotaryEncoderSelect(): Handle rotary encoder actions.
         shutterPressAction(), squarePressAction(): Placeholder for additional actions.
         msgReceiver(sender, msg): Receive and process external messages.
@@ -95,7 +99,9 @@ class MenuControlledEnd(ControlledEnd):
             showIndex: bool = False,
             showPreview: bool = True,
             fontHeight: int = 24,
-            thickness: int = 1
+            thickness: int = 1,
+            scrollMode: bool = False,
+            rotation: int = 0
     ):
         """
             Initializes a MenuControlledEnd instance with customizable menu display options.
@@ -110,6 +116,11 @@ class MenuControlledEnd(ControlledEnd):
                 showPreview (bool): Whether to show a preview for menu options. Defaults to True.
                 fontHeight (int): Height of the font used for menu text. Defaults to 24.
                 thickness (int): Thickness of the font and menu borders. Defaults to 1.
+                scrollMode (bool): Scroll the list row by row instead of page by page. When the display
+                    can scroll in hardware, which is the case in portrait (rotation 90 or 270), only the
+                    row scrolled in is sent. Defaults to False.
+                rotation (int): Clockwise display rotation the menu is drawn for, width and height are
+                    given for that rotation. Defaults to 0.
             Attributes initialized:
                 - Loads menu options from file if path is provided.
                 - Sets up font scaling for normal and highlighted text.
@@ -119,6 +130,7 @@ class MenuControlledEnd(ControlledEnd):
             """
 
         ControlledEnd.__init__(self, _id)
+        self._rotation = rotation
         self.__options = None
         self.__optionList = None
         self.__path, self.__width, self.__height, self.__rowCount = path, width, height, rowCount
@@ -137,6 +149,9 @@ class MenuControlledEnd(ControlledEnd):
         self.__currentOptions: typing.List[dict] = list()
         self.__pageCount = 0
         self.__currentPage = 0
+        self.__firstRow = 0
+        self.__scrollMode = scrollMode
+        self.__pendingScroll = 0
         self.__currentIndex = 0
         self.__currentMenuID = None
         self.__selectIndex = None  # Index selected
@@ -171,8 +186,9 @@ class MenuControlledEnd(ControlledEnd):
             'textDisable': Colors.gray.value
         }
 
-        self.__frameList = None
-        self.__direction = 0
+        self.__latest = None
+        self.__shown = None
+        self._maxFps = 30
         self.__config = configLoader.ConfigLoader('./config.json')
 
     def __pageCountCalc(self):
@@ -228,6 +244,8 @@ class MenuControlledEnd(ControlledEnd):
         self.__spaceCalc()
         self.__selectIndex = None
         self.__currentPage = 0
+        self.__firstRow = 0
+        self.__pendingScroll = 0
         self.__currentIndex = 0
         self.__currentOptions = self.__options[0:self.__rowCount]
 
@@ -528,7 +546,7 @@ class MenuControlledEnd(ControlledEnd):
 
     def upAction(self):
         times = 1
-        for i in self.__options[self.__currentPage * self.__rowCount + self.__currentIndex - 1::-1]:
+        for i in self.__options[self.__firstRow + self.__currentIndex - 1::-1]:
             enable = i.get('enable', True)
             if not enable:
                 times += 1
@@ -541,10 +559,13 @@ class MenuControlledEnd(ControlledEnd):
             self.upOneStep()
 
     def upOneStep(self):
-        if self.__currentPage == 0 and self.__currentIndex == 0:
+        if self.__firstRow == 0 and self.__currentIndex == 0:
             return
-        elif self.__currentPage != 0 and self.__currentIndex == 0:
-            self.__pageUp()
+        elif self.__currentIndex == 0:
+            if self.__scrollMode:
+                self.__scrollRows(-1)
+            else:
+                self.__pageUp()
             return
         self.__currentIndex -= 1
 
@@ -552,6 +573,7 @@ class MenuControlledEnd(ControlledEnd):
         if self.__currentPage == 0:
             return
         self.__currentPage -= 1
+        self.__firstRow = self.__currentPage * self.__rowCount
         self.__currentIndex = self.__rowCount - 1
         self.__currentOptions = self.__options[
             self.__currentPage * self.__rowCount:(self.__currentPage + 1) * self.__rowCount
@@ -559,7 +581,7 @@ class MenuControlledEnd(ControlledEnd):
 
     def downAction(self):
         times = 1
-        for i in self.__options[self.__currentPage * self.__rowCount + self.__currentIndex + 1:]:
+        for i in self.__options[self.__firstRow + self.__currentIndex + 1:]:
             enable = i.get('enable', True)
             if not enable:
                 times += 1
@@ -572,10 +594,13 @@ class MenuControlledEnd(ControlledEnd):
             self.downOneStep()
 
     def downOneStep(self):
-        if self.__currentPage * self.__rowCount + self.__currentIndex + 1 == len(self.__options):
+        if self.__firstRow + self.__currentIndex + 1 == len(self.__options):
             return
         elif self.__currentIndex == self.__rowCount - 1:
-            self.__pageDown()
+            if self.__scrollMode:
+                self.__scrollRows(1)
+            else:
+                self.__pageDown()
             return
         self.__currentIndex += 1
 
@@ -583,11 +608,31 @@ class MenuControlledEnd(ControlledEnd):
         if self.__currentPage == self.__pageCount:
             return
         self.__currentPage += 1
+        self.__firstRow = self.__currentPage * self.__rowCount
         self.__currentIndex = 0
         self.__currentOptions = self.__options[
             self.__currentPage * self.__rowCount:(self.__currentPage + 1) * self.__rowCount
         ]
 
+    def __scrollRows(self, rows):
+        """Move the visible rows by one or more options, the cursor stays on its row"""
+        self.__firstRow += rows
+        self.__pendingScroll += rows
+        self.__currentPage = min(round(self.__firstRow / self.__rowCount), self.__pageCount - 1)
+        self.__currentOptions = self.__options[self.__firstRow:self.__firstRow + self.__rowCount]
+
+    def __scrollHint(self):
+        """
+        (top, bottom, dy) telling the display that the rows of options moved
+        up by dy pixels since the last frame, or None
+        """
+        rows, self.__pendingScroll = self.__pendingScroll, 0
+        if not rows or self.__selectIndex is not None:
+            return None
+        pitch = self.__fontHeight + self.__spaceHeight
+        top = next(self.__genItemStartCoordinate())[1] - self.__spaceHeight // 2
+        return top, top + self.__rowCount * pitch, rows * pitch
+
     def __jumpByIndex(self, index):
         self.__jumpByID(self.__currentOptions[index]['value'])
 
@@ -604,6 +649,8 @@ class MenuControlledEnd(ControlledEnd):
         self.__spaceCalc()
         self.__selectIndex = None
         self.__currentPage = 0
+        self.__firstRow = 0
+        self.__pendingScroll = 0
         self.__currentIndex = 0
         self.__currentOptions = self.__options[0:self.__rowCount]
 
@@ -621,6 +668,8 @@ class MenuControlledEnd(ControlledEnd):
         
         if not self.__showIndex:
             return
+        # Rows move when scrolling, so they are numbered by option instead of by row
+        numberFrom = self.__firstRow + 1 if self.__scrollMode else 1
         for index, i in zip(
                 range(len(self.__currentOptions)),
                 self.__genItemStartCoordinate()
@@ -632,7 +681,7 @@ class MenuControlledEnd(ControlledEnd):
                 cv2.putText(
                     frame,
                     "{} {}".format(
-                        index + 1, self.__currentOptions[index]['content']),
+                        index + numberFrom, self.__currentOptions[index]['content']),
                     (i[0], i[1] + self.__fontHeight),
                     cv2.FONT_ITALIC,
                     self.__fontScale,
@@ -1123,10 +1172,20 @@ class MenuControlledEnd(ControlledEnd):
                 self.__numericalSlideBar(sketch)
             elif t == 'option':
                 self.__optionMenu(sketch)
-
-        if self.__direction:
-            sketch = np.rot90(sketch, -self.__direction // 90)
-        self.__frameList.put(sketch)
+        self.__publish(sketch, self.__scrollHint())
+
+    def __publish(self, sketch, hint):
+        """Replace the frame waiting for the main loop and ask for a refresh"""
+        with self._refresh:
+            pending = self.__latest
+            if pending is not None and pending[1] is not None:
+                # The waiting frame is skipped, its scroll still happened
+                if hint is None and self.__selectIndex is None:
+                    hint = pending[1]
+                elif hint is not None and hint[:2] == pending[1][:2]:
+                    hint = hint[:2] + (hint[2] + pending[1][2],)
+            self.__latest = (sketch, hint)
+            self.invalidate()
 
     def __nextStep(self):
         item: dict = self.__currentOptions[self.__currentIndex]
@@ -1148,26 +1207,40 @@ class MenuControlledEnd(ControlledEnd):
         else:
             item['step'] = item['stepOptions'][currentStepIndex - 1]
 
-    def __valuePlus(self):
+    def __valuePlus(self, steps=1, step=None):
         item = self.__currentOptions[self.__selectIndex]
         if item['type'] != 'numeral':
             return
-        value, step, ma = self.__valueTemp, item['step'], item['max']
-        value += step
+        value, step, ma = self.__valueTemp, step or item['step'], item['max']
+        value += step * steps
         if value >= ma:
             value = ma
         self.__valueTemp = value
 
-    def __valueMinus(self):
+    def __valueMinus(self, steps=1, step=None):
         item = self.__currentOptions[self.__selectIndex]
         if item['type'] != 'numeral':
             return
-        value, step, mi = self.__valueTemp, item['step'], item['min']
-        value -= step
+        value, step, mi = self.__valueTemp, step or item['step'], item['min']
+        value -= step * steps
         if value <= mi:
             value = mi
         self.__valueTemp = value
 
+    def __stepForSpeed(self, speed):
+        """
+        The step of the option being edited for the encoder turned at speed detents per second. Every
+        threshold of rotary_speeds in the input config passed moves one entry up its stepOptions, options
+        without stepOptions multiply their step by 10 instead.
+        """
+        item = self.__currentOptions[self.__selectIndex]
+        faster = sum(speed >= threshold for threshold in self.__config['input']['rotary_speeds'])
+        if 'stepOptions' not in item.keys():
+            return item['step'] * 10 ** faster
+        steps = sorted(item['stepOptions'])
+        index = steps.index(item['step']) if item['step'] in steps else 0
+        return steps[min(index + faster, len(steps) - 1)]
+
     def __optionUp(self):
         item = self.__currentOptions[self.__selectIndex]
         if item['type'] != 'option':
@@ -1198,61 +1271,49 @@ class MenuControlledEnd(ControlledEnd):
         if self.__selectIndex is None:
             self.upAction()
             self.decorate()
-            time.sleep(0.2)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__previousStep()
                 self.decorate()
-                time.sleep(0.2)
             else:
                 self.__optionUp()
                 self.decorate()
-                time.sleep(0.2)
 
     def downPressAction(self):
         if self.__selectIndex is None:
             self.downAction()
             self.decorate()
-            time.sleep(0.2)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__nextStep()
                 self.decorate()
-                time.sleep(0.2)
             else:
                 self.__optionDown()
                 self.decorate()
-                time.sleep(0.2)
 
     def leftPressAction(self):
         if self.__selectIndex is None:
             self.upAction()
             self.decorate()
-            time.sleep(0.2)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__valueMinus()
                 self.decorate()
-                time.sleep(0.1)
             else:
                 self.__optionUp()
                 self.decorate()
-                time.sleep(0.2)
 
     def rightPressAction(self):
         if self.__selectIndex is None:
             self.downAction()
             self.decorate()
-            time.sleep(0.2)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__valuePlus()
                 self.decorate()
-                time.sleep(0.1)
             else:
                 self.__optionDown()
                 self.decorate()
-                time.sleep(0.2)
 
     def circlePressAction(self):
         if self.__selectIndex is not None:
@@ -1275,35 +1336,55 @@ class MenuControlledEnd(ControlledEnd):
     def crossLongPressAction(self):
         self._irq(self.__from)
 
+    def rotaryEncoderRotate(self, ticks, speed):
+        """
+        All detents turned while the last turn was handled, applied at once and drawn once. Clockwise
+        moves the cursor and options up and lowers numerals, like the single detent handlers.
+        """
+        steps = abs(ticks)
+        if self.__selectIndex is None:
+            for _ in range(steps):
+                if ticks > 0:
+                    self.upAction()
+                else:
+                    self.downAction()
+        elif self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
+            step = self.__stepForSpeed(speed)
+            if ticks > 0:
+                self.__valueMinus(steps, step)
+            else:
+                self.__valuePlus(steps, step)
+        else:
+            for _ in range(steps):
+                if ticks > 0:
+                    self.__optionUp()
+                else:
+                    self.__optionDown()
+        self.decorate()
+
     def rotaryEncoderCounterClockwise(self):
         if self.__selectIndex is None:
             self.downAction()
             self.decorate()
-            time.sleep(0.05)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__valuePlus()
                 self.decorate()
-                time.sleep(0.1)
             else:
                 self.__optionDown()
                 self.decorate()
-                time.sleep(0.2)
 
     def rotaryEncoderClockwise(self):
         if self.__selectIndex is None:
             self.upAction()
             self.decorate()
-            time.sleep(0.05)
         else:
             if self.__currentOptions[self.__selectIndex]['type'] == 'numeral':
                 self.__valueMinus()
                 self.decorate()
-                time.sleep(0.1)
             else:
                 self.__optionUp()
                 self.decorate()
-                time.sleep(0.2)
 
     def rotaryEncoderSelect(self):
         if self.__selectIndex is not None:
@@ -1331,16 +1412,19 @@ class MenuControlledEnd(ControlledEnd):
         )
 
     def onEnter(self, lastID):
-        self.__frameList = queue.SimpleQueue()
+        self.__latest = None
         self.decorate()
 
     def onExit(self):
-        self.__frameList.put(
-            np.full((self.__height, self.__width, 3),
-                    self.__theme['background'], np.uint8),
-            block=True
-        )
+        self.__publish(np.full((self.__height, self.__width, 3), self.__theme['background'], np.uint8), None)
 
     def mainLoop(self):
         while True:
-            yield self.__frameList.get(True)
+            with self._refresh:
+                latest, self.__latest = self.__latest, None
+            if latest is not None:
+                self.__shown, self._scroll = latest
+            else:
+                # Woken without a new frame, showing the last one again costs nothing
+                self._scroll = None
+            yield self.__shown
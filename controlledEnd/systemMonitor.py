@@ -7,15 +7,20 @@ import time
 import numpy
 import psutil
 
-from components import MAX17048, INA230, BQ32002
+from components import MAX17048, INA230, BQ32002, configLoader
 import frameDecorator
 from utils.slidingWindowFilter import SlidingWindowFilter
+from utils import metrics
 from . import ControlledEnd
 
 
 class SystemMonitor(ControlledEnd):
-    def __init__(self, _id='SystemMonitor'):
+    def __init__(self, _id='SystemMonitor', width=320, height=240):
         ControlledEnd.__init__(self, _id)
+        self.__width, self.__height = width, height
+        # Redraw once a second for the live readings, sooner when the page changes
+        self._maxFps = 10
+        self._idleFps = 1
         self._id = _id
         self._irq = None
         self._msgSender = None
@@ -23,9 +28,10 @@ class SystemMonitor(ControlledEnd):
             [
                 self.__hardwareReport,
                 self.__powerReport,
-                self.__iwconfig
+                self.__iwconfig,
+                self.__pipelineReport
             ],
-            height=240,
+            height=self.__height,
             padding=(10, 20, 0, 0),
             fontHeight=10,
             color=frameDecorator.Colors.gold.value
@@ -34,6 +40,17 @@ class SystemMonitor(ControlledEnd):
         self.__i = INA230.INA230()
         self.__b = BQ32002.BQ32002()
         self.__b.setTime(datetime.now())
+        # Stage histograms shown on the pipeline page, in the order a frame passes them
+        self.__stages = (
+            ('Capture', 'camera.capture'),
+            ('Convert', 'camera.convert'),
+            ('Decorate', 'camera.decorate'),
+            ('Handoff', 'frame.handoff'),
+            ('Prepare', 'lcd.prepare'),
+            ('Transfer', 'lcd.transfer'),
+            ('Show', 'lcd.show')
+        )
+        self.__shown = (time.monotonic(), metrics.registry.counter('lcd.frames').value)
 
     def __hardwareReport(self):
         try:
@@ -41,7 +58,8 @@ class SystemMonitor(ControlledEnd):
         except ValueError:
             rtc = None
         return {
-            "CPU {}%": round(psutil.cpu_percent(interval=0.3), 2),
+            # Usage since the previous call, the page is redrawn once a second anyway
+            "CPU {}%": round(psutil.cpu_percent(interval=None), 2),
             "MEM {}%": round((psutil.virtual_memory().used / psutil.virtual_memory().total) * 100, 2),
             "DISK {}%": psutil.disk_usage('/').percent,
             "TEMP {} C": psutil.sensors_temperatures()['cpu_thermal'][0].current,
@@ -76,7 +94,6 @@ class SystemMonitor(ControlledEnd):
             power = round(self.__i.readPower(), 2)
         except IOError:
             power = None
-        time.sleep(0.3)
 
         return {
             "BAT {}v {}%": (bat, percent),
@@ -128,20 +145,66 @@ class SystemMonitor(ControlledEnd):
         }
     
 
+    def __pipelineReport(self):
+        registry = metrics.registry
+        report = {}
+        for label, name in self.__stages:
+            histogram = registry.histogram(name)
+            percentiles = [histogram.percentile(q) for q in (0.5, 0.95, 0.99)]
+            report[label + ' {} / {} / {} ms'] = tuple(
+                None if p is None else round(p * 1000, 1) for p in percentiles
+            )
+        # Display rate since the page was drawn last
+        now, shown = time.monotonic(), registry.counter('lcd.frames').value
+        then, before = self.__shown
+        self.__shown = (now, shown)
+        report['FPS cam {} lcd {}'] = (
+            round(registry.gauge('camera.fps').value, 1),
+            round((shown - before) / (now - then), 1) if now > then else None
+        )
+        report['Dropped {}'] = int(registry.gauge('frame.dropped').value)
+        report['Captured {} previewed {}'] = (
+            int(registry.counter('camera.captured').value),
+            int(registry.counter('camera.previewed').value)
+        )
+        resume = registry.histogram('camera.resume').percentile(0.5)
+        report['Camera {} resume {} ms'] = (
+            'on' if registry.gauge('camera.streaming').value else 'standby',
+            None if resume is None else round(resume * 1000)
+        )
+        settle = registry.histogram('camera.settle').percentile(0.5)
+        report['Shot settle {} ms'] = None if settle is None else round(settle * 1000)
+        report['Shots written {} failed {}'] = (
+            int(registry.counter('writer.written').value),
+            int(registry.counter('writer.failed').value)
+        )
+        if not registry.enabled:
+            report = {'Metrics disabled {}': ''}
+        return report
+
+    def centerPressAction(self):
+        path = configLoader.ConfigLoader('./config.json')['metrics']['snapshot_path']
+        if path:
+            metrics.registry.dump(path)
+
     def upReleaseAction(self):
         self.__decorator.previousPage()
+        self.invalidate()
 
     def downPressAction(self):
         self.__decorator.nextPage()
+        self.invalidate()
 
     def crossPressAction(self):
         self._irq("CameraControlledEnd")
 
     def rotaryEncoderClockwise(self):
         self.__decorator.previousPage()
+        self.invalidate()
 
     def rotaryEncoderCounterClockwise(self):
         self.__decorator.nextPage()
+        self.invalidate()
 
     def rotaryEncoderSelect(self):
         pass
@@ -153,9 +216,10 @@ class SystemMonitor(ControlledEnd):
         self._irq = func
 
     def mainLoop(self):
-        frame = numpy.zeros((240, 320, 3), dtype=numpy.uint8)
-        self.__decorator.decorate(frame)
-        yield frame
+        while True:
+            frame = numpy.zeros((self.__height, self.__width, 3), dtype=numpy.uint8)
+            self.__decorator.decorate(frame)
+            yield frame
 
     @property
     def id(self):
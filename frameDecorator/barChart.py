@@ -78,14 +78,10 @@ class BarChart:
         normalized = 10 + 80 * (value - self.__min) / (self.__max - self.__min)
         return min(90.0, max(10.0, normalized))
 
-    def decorate(self, frame, rotate=0):
+    def decorate(self, frame):
         # 创建透明图层
         overlay = np.zeros_like(frame)
         
-        # 计算旋转角度
-        rotation_count = rotate // 90
-        rotated = rotation_count % 4 != 0
-        
         # 预计算绘图参数
         bar_width = self.__step
         base_y = self.__height
@@ -126,9 +122,5 @@ class BarChart:
             cv2.addWeighted(overlay, self.__alpha, blended, 1 - self.__alpha, 0, blended)
             overlay = blended
         
-        # 应用旋转
-        if rotated:
-            overlay = np.rot90(overlay, -rotation_count)
-        
         # 叠加到原图
         cv2.add(frame, overlay, frame)
\ No newline at end of file
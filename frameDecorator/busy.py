@@ -6,37 +6,25 @@ class Busy:
         self.__width = width
         self.__height = height
         self.__color = color
+        self.__fontScale = cv2.getFontScaleFromHeight(cv2.FONT_HERSHEY_SIMPLEX, self.__height // 24)
 
-    def decorate(self, frame, rotate=0):
-        if rotate == 0:
-            cv2.rectangle(
+    def decorate(self, frame, count=0):
+        """Draw the busy mark, with the number of things queued in it when count is given"""
+        cv2.rectangle(
+            frame,
+            (self.__width - self.__width // 16, 0),
+            (self.__width, self.__height // 16),
+            color=self.__color,
+            thickness=-1
+        )
+        if count:
+            cv2.putText(
                 frame,
-                (self.__width - self.__width // 16, 0),
-                (self.__width, self.__height // 16),
-                color=self.__color,
-                thickness=-1
-            )
-        elif rotate == 90:
-            cv2.rectangle(
-                frame,
-                (self.__width - self.__width // 16, self.__height - self.__height // 16),
-                (self.__width, self.__height),
-                color=self.__color,
-                thickness=-1
-            )
-        elif rotate == 180:
-            cv2.rectangle(
-                frame,
-                (0, self.__height - self.__height // 16),
-                (self.__width // 16, self.__height),
-                color=self.__color,
-                thickness=-1
-            )
-        elif rotate == 270:
-            cv2.rectangle(
-                frame,
-                (0, 0),
-                (self.__width // 16, self.__height // 16),
-                color=self.__color,
-                thickness=-1
+                str(count) if count < 10 else '+',
+                (self.__width - self.__width // 16 + 2, self.__height // 16 - 3),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                self.__fontScale,
+                (255, 255, 255),
+                1,
+                cv2.LINE_AA
             )
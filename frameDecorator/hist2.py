@@ -36,7 +36,7 @@ class Hist2:
         self.__min = np.min(all_data)
         self.__max = np.max(all_data)
 
-    def decorate(self, frame, rotate=0):
+    def decorate(self, frame):
         self.__frameCalc(frame)
         sketch = np.zeros((self.__height, self.__width, 3), dtype=np.uint8)
 
@@ -80,10 +80,4 @@ class Hist2:
                         -1
                     )
 
-        
-        if rotate != 0:
-            rotateTimes = rotate // 90 % 4  # 标准化旋转角度
-            if rotateTimes != 0:
-                sketch = np.rot90(sketch, rotateTimes)
-
         cv2.add(sketch, frame, frame)
@@ -54,7 +54,7 @@ class SimpleText:
             raise IndexError(
                 f"Page index out of range [0, {self.totalPages - 1}]")
 
-    def decorate(self, frame, rotate=0):
+    def decorate(self, frame):
         widget = self.__funcList[self.__index]()
         if not widget:
             return frame
@@ -93,10 +93,5 @@ class SimpleText:
             )
             yPos += self.__fontHeight + step
 
-        if rotate != 0:
-            rotateTimes = (-rotate // 90) % 4
-            if rotateTimes:
-                sketch = np.rot90(sketch, rotateTimes)
-
         cv2.addWeighted(sketch, 1, frame, 1, 0, frame)
         return frame
@@ -29,7 +29,7 @@ class Toast:
         self.__text = text
         self.__isUpdate = True
 
-    def decorate(self, frame, rotate=0):
+    def decorate(self, frame):
         if self.__text:
             sketch = np.zeros(frame.shape, np.uint8)
             cv2.rectangle(
@@ -50,7 +50,5 @@ class Toast:
                 self.__fontScale,
                 (255, 255, 255)
             )
-            if rotate:
-                sketch = np.rot90(sketch, -rotate // 90)
             cv2.addWeighted(sketch, 1, frame, 1, 0, frame)
             self.__isUpdate = False
@@ -1,37 +1,96 @@
 #!/usr/bin/env python3
 import os
+import signal
 import time
 
+from utils.bootTrace import tracer
+# Imported here one by one so the boot trace shows what each costs, the modules below need them anyway
+tracer.importModules(('numpy', 'cv2', 'picamera2', 'gpiozero'))
 
 import universalControl
 from components import lcd20, configLoader
-from controlledEnd import MenuControlledEnd, GalleryControlledEnd, CameraControlledEnd, SystemMonitor
+import controlledEnd
+from controlledEnd import LazyControlledEnd
 from utils.exceptionRecorder import exceptionRecorder
+from utils import metrics
 
 tuning = './pisp/imx477.json'
 
 
-config = configLoader.ConfigLoader('./config.json')
-u = universalControl.UniversalControl(
-    lcd20.Lcd(),
-    [
-        SystemMonitor(),
-        CameraControlledEnd(
-            verbose_console=config['debug_level'],
-            #tuningFilePath=tuning
-        ),
-        MenuControlledEnd(
-            path='a.json',
-            showPreview=True,
-            rowCount=5,
-            showIndex=True,
-            fontHeight=14,
-            padding=(5, 5, 5, 5)
-        ),
-        GalleryControlledEnd(pictPath=config['camera']['path']),
-        
-    ]
-)
-
-
-u.mainLoop()
+
+
+def createLcd(screen, transport=None):
+    """
+    The ST7789 on the board, or a virtual display when the screen driver is virtual.
+    transport is the SpiTransport of the bootstrap, whose panel already shows the splash
+    """
+    if screen.get('driver', 'st7789') != 'virtual':
+        return lcd20.Lcd(
+            transport=transport,
+            calibration=screen.get('calibration'),
+            chunkSize=screen.get('spi_chunk_size'),
+            writerThread=screen.get('spi_writer_thread', True)
+        )
+    from components.virtualDisplay import VirtualLcd
+    virtual = screen.get('virtual', {})
+    return VirtualLcd(
+        path=virtual.get('path', './pict/framebuffer.raw'),
+        pixelFormat=virtual.get('format', 'rgb565'),
+        snapshotPath=virtual.get('snapshot_path'),
+        videoPath=virtual.get('video_path'),
+        everyNth=virtual.get('every_nth', 1),
+        fps=virtual.get('fps', 30),
+        width=screen['width'],
+        height=screen['height'],
+        calibration=screen.get('calibration'),
+        writerThread=screen.get('spi_writer_thread', True)
+    )
+
+
+def main(transport=None):
+    config = configLoader.ConfigLoader('./config.json')
+    # systemd stops the service with SIGTERM, shut down like on Ctrl+C so the last frame is cached
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # Before the display process is forked, so it applies there too
+    metrics.registry.enabled = config['metrics']['enabled']
+    # The menu is drawn upright for its rotation, in portrait the panel scrolls it in hardware
+    menuWidth, menuHeight = config['screen']['width'], config['screen']['height']
+    if config['menu']['rotation'] in (90, 270):
+        menuWidth, menuHeight = menuHeight, menuWidth
+    u = universalControl.UniversalControl(
+        createLcd(config['screen'], transport),
+        [
+            # Shown first, the others are built once its first frame is out
+            controlledEnd.CameraControlledEnd(
+                verbose_console=config['debug_level'],
+                #tuningFilePath=tuning
+            ),
+            LazyControlledEnd('MenuControlledEnd', lambda: controlledEnd.MenuControlledEnd(
+                path='a.json',
+                width=menuWidth,
+                height=menuHeight,
+                showPreview=True,
+                rowCount=5,
+                showIndex=True,
+                fontHeight=14,
+                padding=(5, 5, 5, 5),
+                # Row by row only pays off where the panel scrolls the rows in hardware
+                scrollMode=config['menu']['scroll_mode'] and lcd20.Lcd.scrollsAt(config['menu']['rotation']),
+                rotation=config['menu']['rotation']
+            )),
+            LazyControlledEnd('GalleryControlledEnd', lambda: controlledEnd.GalleryControlledEnd(
+                width=config['screen']['width'],
+                height=config['screen']['height'],
+                pictPath=config['camera']['path']
+            )),
+            LazyControlledEnd('SystemMonitor', lambda: controlledEnd.SystemMonitor(
+                width=config['screen']['width'],
+                height=config['screen']['height']
+            )),
+        ]
+    )
+    u.mainLoop()
+
+
+if __name__ == '__main__':
+    main()
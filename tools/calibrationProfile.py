@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Build a screen calibration profile from a test pattern.
+
+1. Write the pattern and show it on the panel, e.g. through the gallery:
+       python3 tools/calibrationProfile.py pattern pattern.png
+2. Photograph the panel, crop the photo to the screen area.
+3. Fit the profile and paste it into config.json under screen.calibration:
+       python3 tools/calibrationProfile.py fit photo.jpg
+
+The top half of the pattern is a ramp of gray bars, the bottom half is
+white. The fitted gamma makes the measured ramp linear in the photo, the
+white point scales the brighter channels down to the dimmest one.
+"""
+import argparse
+import json
+import sys
+
+import cv2
+import numpy
+
+STEPS = 16
+WIDTH, HEIGHT = 320, 240
+
+
+def levels():
+    return numpy.linspace(0, 255, STEPS).round().astype(int)
+
+
+def pattern():
+    image = numpy.full((HEIGHT, WIDTH, 3), 255, numpy.uint8)
+    bar = WIDTH // STEPS
+    for i, level in enumerate(levels()):
+        image[:HEIGHT // 2, i * bar:(i + 1) * bar] = level
+    return image
+
+
+def measure(photo):
+    """Mean B, G, R of the middle of every bar and of the white half"""
+    photo = cv2.resize(photo, (WIDTH, HEIGHT), interpolation=cv2.INTER_AREA).astype(float)
+    bar = WIDTH // STEPS
+    margin = bar // 4
+    top = slice(HEIGHT // 8, HEIGHT * 3 // 8)
+    ramp = numpy.array([
+        photo[top, i * bar + margin:(i + 1) * bar - margin].reshape(-1, 3).mean(axis=0)
+        for i in range(STEPS)
+    ])
+    white = photo[HEIGHT * 5 // 8:HEIGHT * 7 // 8, WIDTH // 8:WIDTH * 7 // 8].reshape(-1, 3).mean(axis=0)
+    return ramp, white
+
+
+def fit(ramp, white):
+    """Per channel correction exponent and white gain, returned in R, G, B order"""
+    x = levels() / 255
+    gamma, gain = [], []
+    for channel in (2, 1, 0):
+        black, top = ramp[0, channel], ramp[-1, channel]
+        y = (ramp[:, channel] - black) / max(top - black, 1e-6)
+        # Skip the ends, log is undefined at 0 and 1 carries no slope
+        usable = (x > 0.05) & (x < 0.95) & (y > 1e-3)
+        slope = numpy.polyfit(numpy.log(x[usable]), numpy.log(y[usable]), 1)[0]
+        gamma.append(round(1 / slope, 3))
+        gain.append(white[channel])
+    gain = [round(min(gain) / g, 3) for g in gain]
+    return {'gamma': gamma, 'white': gain}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('pattern', help='write the test pattern').add_argument('output')
+    commands.add_parser('fit', help='fit a profile to a photo of the pattern').add_argument('photo')
+    args = parser.parse_args()
+
+    if args.command == 'pattern':
+        cv2.imwrite(args.output, pattern())
+        return 0
+    photo = cv2.imread(args.photo)
+    if photo is None:
+        print('Cannot read {}'.format(args.photo), file=sys.stderr)
+        return 1
+    print(json.dumps(fit(*measure(photo)), indent=4))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+CPU load and board power of the camera while previewing, idling and in
+standby, and the latency of a warm resume. Run it on the device with the
+service stopped:
+
+    sudo systemctl stop cam
+    python3 tools/cameraPowerBenchmark.py [--seconds 20] [--cycles 10]
+
+Process CPU covers the libcamera threads of this process, system CPU the
+whole board. Power is the mean of INA230 readings taken every 100 ms. The
+preview phase consumes frames the way the camera view does, without drawing.
+The idle phase applies the idle section of config.json, the preview frame
+rate and the backlight level, the others keep the backlight fully on.
+Run it once per camera.preview_mode to compare the preview conversions.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components import INA230, configLoader, lcdTransport  # noqa: E402
+from components.picam2 import Cam  # noqa: E402
+
+
+def systemCpuTimes():
+    with open('/proc/stat') as f:
+        values = [int(v) for v in f.readline().split()[1:]]
+    idle = values[3] + values[4]
+    return sum(values) - idle, sum(values)
+
+
+class PowerSampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.__ina = INA230.INA230()
+        self.__interval = interval
+        self.__samples = []
+        self.__running = threading.Event()
+
+    def run(self):
+        while True:
+            if self.__running.is_set():
+                self.__samples.append(self.__ina.readPower())
+            time.sleep(self.__interval)
+
+    def begin(self):
+        self.__samples = []
+        self.__running.set()
+
+    def end(self):
+        self.__running.clear()
+        return sum(self.__samples) / len(self.__samples) if self.__samples else float('nan')
+
+
+def measure(name, seconds, sampler, work):
+    """Run work() until seconds passed, returns a row of the report"""
+    processStart = os.times()
+    busyStart, totalStart = systemCpuTimes()
+    sampler.begin()
+    start = time.monotonic()
+    frames = 0
+    while time.monotonic() - start < seconds:
+        frames += work()
+    elapsed = time.monotonic() - start
+    power = sampler.end()
+    processEnd = os.times()
+    busyEnd, totalEnd = systemCpuTimes()
+    processCpu = (processEnd.user + processEnd.system - processStart.user - processStart.system) / elapsed
+    systemCpu = (busyEnd - busyStart) / max(1, totalEnd - totalStart)
+    return name, frames / elapsed, processCpu * 100, systemCpu * 100, power
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=20, help='length of each phase')
+    parser.add_argument('--cycles', type=int, default=10, help='standby and resume cycles timed')
+    args = parser.parse_args()
+
+    idleConfig = configLoader.ConfigLoader('./config.json')['idle']
+    cam = Cam()
+    transport = lcdTransport.SpiTransport()
+    transport.backlight(True)
+    sampler = PowerSampler()
+    sampler.start()
+    preview = cam.preview()
+    next(preview)
+
+    def previewFrame():
+        next(preview)
+        return 1
+
+    def idle():
+        time.sleep(0.1)
+        return 0
+
+    rows = [measure('preview', args.seconds, sampler, previewFrame)]
+    cam.setFrameRate(idleConfig['preview_fps'])
+    transport.brightness(idleConfig['backlight'])
+    next(preview)
+    rows.append(measure('idle', args.seconds, sampler, previewFrame))
+    cam.setFrameRate(None)
+    transport.brightness(1.0)
+    cam.standby()
+    rows.append(measure('standby', args.seconds, sampler, idle))
+    cam.resume()
+
+    latencies = []
+    for _ in range(args.cycles):
+        cam.standby()
+        time.sleep(0.5)
+        start = time.perf_counter()
+        cam.resume()
+        next(preview)
+        latencies.append(time.perf_counter() - start)
+    cam.release()
+    transport.close()
+
+    print('preview mode {}\n'.format(configLoader.ConfigLoader('./config.json')['camera'].get('preview_mode', 'panel')))
+    print('{:<10} {:>8} {:>12} {:>12} {:>10}'.format('phase', 'fps', 'process CPU', 'system CPU', 'power'))
+    for name, fps, processCpu, systemCpu, power in rows:
+        print('{:<10} {:>8.1f} {:>11.1f}% {:>11.1f}% {:>8.3f} W'.format(name, fps, processCpu, systemCpu, power))
+    print()
+    for name, _, _, systemCpu, power in rows[1:]:
+        print('{} saves {:.3f} W and {:.1f}% system CPU'.format(name, rows[0][4] - power, rows[0][3] - systemCpu))
+    latencies.sort()
+    print('resume to first frame: min {:.0f} ms, median {:.0f} ms, max {:.0f} ms'.format(
+        latencies[0] * 1000, latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Look at the framebuffer file written by components.virtualDisplay.VirtualLcd.
+
+Opens the file read-only next to the running UI, or over sshfs/NFS for a
+remote view, and shows it in a window refreshed at the given rate. With
+--png the current content is saved once instead.
+
+    python3 tools/framebufferView.py [path] [--fps N] [--png out.png]
+"""
+import argparse
+import json
+import sys
+
+import cv2
+import numpy
+
+
+def load(path):
+    with open(path + '.json') as f:
+        layout = json.load(f)
+    if layout['format'] == 'rgb565':
+        return layout, numpy.memmap(path, numpy.dtype('>u2'), 'r', shape=(layout['height'], layout['width']))
+    return layout, numpy.memmap(path, numpy.uint8, 'r', shape=(layout['height'], layout['width'], 3))
+
+
+def toBgr(frame, pixelFormat):
+    if pixelFormat == 'rgb888':
+        return numpy.ascontiguousarray(frame[..., ::-1])
+    words = frame.astype(numpy.uint16)
+    image = numpy.empty(words.shape + (3,), numpy.uint8)
+    image[..., 2] = (words >> 8) & 0xF8
+    image[..., 1] = (words >> 3) & 0xFC
+    image[..., 0] = (words << 3) & 0xF8
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', nargs='?', default='./pict/framebuffer.raw')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--png', help='save the current frame and exit')
+    args = parser.parse_args()
+
+    layout, frame = load(args.path)
+    if args.png:
+        cv2.imwrite(args.png, toBgr(frame, layout['format']))
+        return 0
+    delay = max(1, int(1000 / args.fps))
+    while True:
+        cv2.imshow(args.path, toBgr(frame, layout['format']))
+        if cv2.waitKey(delay) & 0xFF in (ord('q'), 27):
+            break
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
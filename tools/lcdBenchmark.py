@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Throughput of the display path without the panel.
+
+Drives Lcd.showImage and Lcd.clear through a RecordingTransport with
+synthetic frames and reports frames per second, microseconds per stage and
+bytes per frame. The transfer column is the time the bytes would take on
+the SPI bus at the given clock, the host does not move them anywhere.
+The pipeline section then lets the stand-in sleep for that time and
+compares sending on the caller's thread against the writer thread.
+
+    python3 tools/lcdBenchmark.py [--frames N] [--spi-freq HZ] [--chunk-size BYTES] [--verify]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.lcd20 import Lcd  # noqa: E402
+from components.lcdTransport import RecordingTransport, FramebufferTransport  # noqa: E402
+
+
+def syntheticFrames(width, height, scene, count=8):
+    """A few frames cycled through by the benchmark, generated up front"""
+    rng = numpy.random.default_rng(0)
+    base = numpy.zeros((height, width, 3), numpy.uint8)
+    base[..., 0] = numpy.linspace(0, 255, width, dtype=numpy.uint8)
+    base[..., 1] = numpy.linspace(0, 255, height, dtype=numpy.uint8)[:, None]
+    base[..., 2] = 128
+    frames = []
+    for i in range(count):
+        if scene == 'noise':
+            frames.append(rng.integers(0, 256, (height, width, 3), numpy.uint8))
+        elif scene == 'static':
+            frames.append(base)
+        else:
+            # A small box moving over a still background, like a toast or a cursor
+            frame = base.copy()
+            size = height // 8
+            x, y = i * size % (width - size), i * size // 2 % (height - size)
+            cv2.rectangle(frame, (x, y), (x + size, y + size), (255, 255, 255), -1)
+            frames.append(frame)
+    return frames
+
+
+def timeStage(function, frames, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        function(frames[i % len(frames)])
+    return (time.perf_counter() - start) / repeat
+
+
+def run(width, height, scene, frames, spiFreq, chunkSize):
+    transport = RecordingTransport(chunkSize)
+    lcd = Lcd(transport=transport, writerThread=False)
+    lcd.Init()
+    images = syntheticFrames(width, height, scene)
+    panel = [
+        cv2.resize(img, (lcd.width, lcd.height)) if img.shape[:2] != (lcd.height, lcd.width) else img
+        for img in images
+    ]
+    resized = numpy.empty((lcd.height, lcd.width, 3), numpy.uint8)
+
+    if images[0].shape[:2] != (lcd.height, lcd.width):
+        resize = timeStage(lambda img: cv2.resize(img, (lcd.width, lcd.height), dst=resized), images, frames)
+    else:
+        resize = 0.0
+    pack = timeStage(lcd.pack, panel, frames)
+    packed = [lcd.pack(img).copy() for img in panel]
+    # Diff against the frame before it, the way showImage sees the stream
+    lcd.showImage(panel[-1])
+    diff = timeStage(lcd.dirtyRegions, packed, frames)
+
+    lcd.clear()
+    transport.resetStatistics()
+    start = time.perf_counter()
+    for i in range(frames):
+        lcd.showImage(images[i % len(images)])
+    total = (time.perf_counter() - start) / frames
+    stats = transport.snapshot()
+    bytesPerFrame = stats['bytes'] / frames
+    transfer = bytesPerFrame * 8 / spiFreq
+
+    return {
+        'input': '{}x{}'.format(width, height),
+        'scene': scene,
+        'resize': resize,
+        'pack': pack,
+        'diff': diff,
+        'transfer': transfer,
+        'host fps': 1 / total,
+        'panel fps': 1 / (total + transfer),
+        'bytes': bytesPerFrame,
+        'calls': stats['transfers'] / frames,
+        'windows': stats['windows'] / frames
+    }
+
+
+def runClear(frames, spiFreq):
+    transport = RecordingTransport()
+    lcd = Lcd(transport=transport, writerThread=False)
+    lcd.Init()
+    transport.resetStatistics()
+    start = time.perf_counter()
+    for _ in range(frames):
+        lcd.clear()
+    total = (time.perf_counter() - start) / frames
+    bytesPerFrame = transport.snapshot()['bytes'] / frames
+    return total, bytesPerFrame, bytesPerFrame * 8 / spiFreq
+
+
+def runPipeline(width, height, frames, spiFreq, writerThread):
+    """Frames per second and bus throughput with transfers that take as long as on the panel"""
+    lcd = Lcd(transport=RecordingTransport(frequency=spiFreq), writerThread=writerThread)
+    lcd.Init()
+    images = syntheticFrames(width, height, 'noise')
+    start = time.perf_counter()
+    for i in range(frames):
+        lcd.showImage(images[i % len(images)])
+    lcd.flush()
+    fps = frames / (time.perf_counter() - start)
+    return fps, lcd.throughput
+
+
+def verify():
+    """Send frames through the framebuffer stand-in and compare what the panel would show"""
+    worst = 0
+    for rotation in (0, 90, 180, 270):
+        transport = FramebufferTransport()
+        lcd = Lcd(transport=transport, rotation=rotation)
+        lcd.Init()
+        for img in syntheticFrames(lcd.width, lcd.height, 'box') + syntheticFrames(lcd.width, lcd.height, 'noise', 2):
+            lcd.showImage(img)
+            lcd.flush()
+            # What the panel shows, turned back into the frame that was drawn
+            shown = numpy.rot90(transport.image, rotation // 90)
+            expected = img & numpy.array([0xF8, 0xFC, 0xF8], numpy.uint8)
+            worst = max(worst, int(numpy.abs(shown.astype(int) - expected).max()))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--spi-freq', type=int, default=80000000)
+    parser.add_argument('--chunk-size', type=int, default=4096, help='bytes per transfer call, the spidev bufsiz')
+    parser.add_argument('--verify', action='store_true', help='check the decoded panel content too')
+    args = parser.parse_args()
+
+    columns = ('input', 'scene', 'resize', 'pack', 'diff', 'transfer', 'host fps', 'panel fps', 'bytes', 'calls',
+               'windows')
+    print('{:>8} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8} {:>6} {:>7}'.format(*columns))
+    print('{:>8} {:>6} {:>9} {:>9} {:>9} {:>9}'.format('', '', 'us', 'us', 'us', 'us'))
+    for width, height in ((320, 240), (640, 480)):
+        for scene in ('noise', 'box', 'static'):
+            r = run(width, height, scene, args.frames, args.spi_freq, args.chunk_size)
+            print('{:>8} {:>6} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.1f} {:>9.1f} {:>8.0f} {:>6.1f} {:>7.1f}'.format(
+                r['input'], r['scene'],
+                r['resize'] * 1e6, r['pack'] * 1e6, r['diff'] * 1e6, r['transfer'] * 1e6,
+                r['host fps'], r['panel fps'], r['bytes'], r['calls'], r['windows']
+            ))
+
+    total, bytesPerFrame, transfer = runClear(args.frames, args.spi_freq)
+    print('clear: {:.0f} us on the host, {:.0f} us on the bus, {:.0f} bytes'.format(
+        total * 1e6, transfer * 1e6, bytesPerFrame))
+    print('spi clock {:.0f} MHz, pack includes the RGB888 to RGB565 conversion'.format(args.spi_freq / 1e6))
+
+    for width, height in ((320, 240), (640, 480)):
+        for writerThread in (False, True):
+            fps, throughput = runPipeline(width, height, max(args.frames // 4, 10), args.spi_freq, writerThread)
+            print('pipeline {}x{} {:>13}: {:5.1f} fps, {:.2f} of {:.2f} MB/s'.format(
+                width, height, 'writer thread' if writerThread else 'caller thread', fps,
+                throughput['MB/s'], throughput['max MB/s']))
+
+    if args.verify:
+        worst = verify()
+        print('verify: largest channel error {} ({})'.format(worst, 'ok' if worst == 0 else 'MISMATCH'))
+        return 0 if worst == 0 else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
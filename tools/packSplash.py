@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Pack an image into the splash frame the bootstrap shows at power on.
+
+The image is scaled to the screen and packed by Lcd, with the screen
+calibration of config.json, into the big-endian RGB565 words sent to the
+panel, so bootstrap.py only has to copy the file to SPI.
+
+    python3 tools/packSplash.py logo.png [--output ./pict/splash.rgb565] [--rotation 0]
+
+Without an image a plain splash with the given text is drawn.
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components import configLoader  # noqa: E402
+from components.lcd20 import Lcd  # noqa: E402
+from components.lcdTransport import RecordingTransport  # noqa: E402
+
+
+def textSplash(width, height, text):
+    image = numpy.zeros((height, width, 3), numpy.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    (textWidth, textHeight), _ = cv2.getTextSize(text, font, 1, 2)
+    cv2.putText(image, text, ((width - textWidth) // 2, (height + textHeight) // 2), font, 1,
+                (255, 255, 255), 2, cv2.LINE_AA)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', nargs='?', help='image to pack, a text splash when omitted')
+    parser.add_argument('--output', help='packed frame, screen.splash.path of config.json by default')
+    parser.add_argument('--rotation', type=int, default=0, choices=(0, 90, 180, 270))
+    parser.add_argument('--text', default='Starting', help='text of the plain splash')
+    args = parser.parse_args()
+
+    screen = configLoader.ConfigLoader('./config.json')['screen']
+    lcd = Lcd(screen['width'], screen['height'], rotation=args.rotation, transport=RecordingTransport(),
+              calibration=screen.get('calibration'), writerThread=False)
+    if args.image:
+        image = cv2.imread(args.image)
+        if image is None:
+            sys.exit("Cannot read {}".format(args.image))
+    else:
+        image = textSplash(lcd.width, lcd.height, args.text)
+    lcd.showImage(image)
+    output = args.output or screen['splash']['path']
+    lcd.cacheFrame(output)
+    print("{}x{} splash written to {}".format(lcd.width, lcd.height, output))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,43 @@
+import asyncio
+import collections
 import multiprocessing
+import os
+import signal
 import subprocess
 import threading
 import time
-from typing import List
+from typing import List, Union
 
 import gpiozero
 
 import controlledEnd
 import frameDecorator
 from components import lcd20, configLoader
-from utils import exceptionRecorder, initialize_logger
+from utils import exceptionRecorder, initialize_logger, metrics, profiler, GestureEngine, SharedFrameBuffer
+from utils.bootTrace import tracer
+
+# Button: config pin, ControlledEnd press, release and long press handler
+BUTTONS = {
+    'shutter': ('shutter', 'shutterPressAction', 'shutterReleaseAction', 'shutterLongPressAction'),
+    'square': ('square', 'squarePressAction', 'squareReleaseAction', 'squareLongPressAction'),
+    'cross': ('cross', 'crossPressAction', 'crossReleaseAction', 'crossLongPressAction'),
+    'circle': ('circle', 'circlePressAction', 'circleReleaseAction', 'circleLongPressAction'),
+    'up': ('up', 'upPressAction', 'upReleaseAction', None),
+    'down': ('down', 'downPressAction', 'downReleaseAction', None),
+    'left': ('left', 'leftPressAction', 'leftReleaseAction', None),
+    'right': ('right', 'rightPressAction', 'rightReleaseAction', None),
+    'center': ('center', 'centerPressAction', 'centerReleaseAction', None),
+    'rotaryEncoderSelect': ('rotaryEncoder1S', 'rotaryEncoderSelect', None, None),
+}
+HANDOFF = metrics.registry.histogram('frame.handoff')
+SHOW = metrics.registry.histogram('lcd.show')
+SHOWN = metrics.registry.counter('lcd.frames')
+DROPPED = metrics.registry.gauge('frame.dropped')
+
+# Buttons whose press action repeats while held
+REPEATABLE = ('up', 'down', 'left', 'right')
+# Detents further apart than this, in seconds, start a new turn for the speed measurement
+ROTARY_PAUSE = 0.3
 
 
 class UniversalControl:
@@ -18,172 +46,396 @@ class UniversalControl:
     and routes hardware input events (such as button presses and rotary encoder actions) to the
     currently active controlled end. It also handles inter-widget messaging, LCD display updates,
     and GPIO initialization for hardware controls.
+
+    Everything runs on one asyncio event loop. GPIO callbacks, _irq and _msgSender only queue an
+    event, from whatever thread they are called on, and a single task routes the events in order.
+    Each controlled end sits behind a ControlledEndAdapter whose mailbox runs its handlers, messages
+    and frame production on one worker thread of its own, so a controlled end never races itself and
+    a slow handler delays neither the input nor the other controlled ends.
     Attributes:
-        __controlledEndList (List[controlledEnd.ControlledEnd]): List of controlled end instances.
+        __controlledEndList (List[controlledEnd.ControlledEnd]): List of controlled end instances. The first one
+            is shown at start, the others may be LazyControlledEnd and are built after the first frame, or
+            when they are switched to before that.
+        __widgets (Dict[str, ControlledEndAdapter]): Adapters by controlled end id.
+        __devices (Dict[str, gpiozero.Device]): Buttons and the rotary encoder by name.
+        __gestures (GestureEngine): Turns button edges into press, release, long press and repeat gestures.
+        __deferred (Dict[str, str]): Buttons whose press action waits for a short release, with the view id.
+        __turn (dict): Rotary encoder detents waiting to be handed on and the timestamps the speed is measured from.
         __config (ConfigLoader): Configuration loader for hardware pin and debug settings.
         __logger (Logger): Logger instance for debugging and info messages.
         __enable (bool): Flag indicating if input handling is enabled.
-        __rights (int): Index of the currently active controlled end.
+        __active (str): ID of the currently active controlled end.
         __lastWidget (str): ID of the last controlled end, used for return operations.
         __lcd (lcd20.Lcd): LCD display instance.
+        __loop (asyncio.AbstractEventLoop): The event loop everything is scheduled on.
+        __events (asyncio.Queue): Input, switch and message events in arrival order.
+        __firstFrame (asyncio.Event): Set once the first frame was handed to the display process.
+        __firstShown (RawArray): time.monotonic() the first frame started and finished going to the panel.
+        __lastInput (float): time.monotonic() of the last input event.
+        __idle (bool): Whether the shown view was told it is idle.
+        __backlight (RawValue): Backlight level for the display process, dimmed while idle.
         __frame (Any): Current frame generated by the active controlled end.
         __signal (bool): Signal flag for switching controlled ends.
         __w (frameDecorator.Warining): Warning frame decorator instance.
-        __frameList (multiprocessing.Queue): Queue for passing frames to the display process.
+        __frameBuffer (SharedFrameBuffer): Shared memory buffer passing frames to the display process.
+        __notice (str or None): Text shown in a toast over every frame.
+        __profile (ProfileSession or None): Profiling session of this process while one runs.
+        __profileRequest (RawArray): Deadline and id of the latest profiling session, read by the display process.
         __t (multiprocessing.Process): Process for displaying images on the LCD.
     Methods:
         __init__(lcd, controlledEndList):
             Initializes UniversalControl, sets up hardware, logging, and controlled ends.
         __gpioInit():
-            Initializes GPIO input devices and assigns event handlers for hardware controls.
+            Initializes GPIO input devices and queues an event on each edge or rotation.
+        __edge(button, pressed):
+            Queue a timestamped button edge for the gesture engine.
+        __post(*event):
+            Queue an event from any thread.
+        __dispatch():
+            Task handing the queued events to the gesture engine and the mailboxes of the controlled ends.
+        __gesture(gesture, button):
+            Calls the press, release and long press handlers of the active controlled end for a gesture.
+        __rotate(direction, timestamp), __flushTicks():
+            Coalesce rotary encoder detents and hand them to rotaryEncoderRotate with the turning speed.
         __msgReceiver(msg):
             Handles messages sent to UniversalControl, such as system commands.
+        __startProfile(), __profileProgress(), __profileDisplay(session):
+            Time-boxed cProfile and tracemalloc capture, asked for with the 'profile' message.
+        __showNotice(frame):
+            Draws the notice over a copy of a frame.
         __irq(_id):
             Switches control to the controlled end with the specified ID.
         __msgSender(sender, receiver, msg):
             Routes messages between controlled ends or to UniversalControl.
         showImageInAnotherThread(imgList):
             Continuously displays images from a list in a separate thread.
-        showImageInAnotherProcess(imgList):
-            Continuously displays images from a multiprocessing queue in a separate process.
-        __centerPressAction(), __centerReleaseAction(), __circlePressAction(), __squarePressAction(),
-        __crossPressAction(), __shutterPressAction(), __upPressAction(), __downPressAction(),
-        __rightPressAction(), __leftPressAction(), __upReleaseAction(), __downReleaseAction(),
-        __rightReleaseAction(), __leftReleaseAction(), __rotaryEncoderSelectAction(),
-        __rotaryEncoderClockwise(), __rotaryEncoderCounterClockwise():
-            Event handlers for various hardware input actions, routed to the active controlled end.
+        showImageInAnotherProcess(frameBuffer):
+            Continuously displays the newest frame of a shared frame buffer in a separate process.
+        frameStatistics:
+            Written, read and dropped frame counts of the display hand-off.
+        __buildLazy():
+            Task building the lazy controlled ends after the first frame.
+        __bootReport():
+            Task finishing the boot trace once the first frame is on the panel.
+        __activity(), __idleWatch():
+            Idle governor, onIdle and a dimmed backlight after a while without input, onWake on the next input.
+        __frames():
+            Task that manages the lifecycle of controlled ends, handles switching, and updates
+            the LCD display with frames from the active controlled end. Between frames it waits
+            until the active controlled end asks for a refresh.
         mainLoop():
-            Main event loop that manages the lifecycle of controlled ends, handles switching,
-            and updates the LCD display with frames from the active controlled end.
+            Runs the event loop until interrupted.
     '''
 
-    def __init__(self, lcd: lcd20.Lcd, controlledEndList: List[controlledEnd.ControlledEnd]):
+    def __init__(self, lcd: lcd20.Lcd,
+                 controlledEndList: List[Union[controlledEnd.ControlledEnd, controlledEnd.LazyControlledEnd]]):
         self.__controlledEndList = controlledEndList
         self.__config = configLoader.ConfigLoader('./config.json')
         self.__logger = initialize_logger(
             console_level=self.__config['debug_level'])
         self.__enable = True
-        self.__rights = 0  # Current controlled end in use
+        self.__active = controlledEndList[0].id  # Current controlled end in use
         self.__lastWidget = None  # Last controlled end, used for return operation
         self.__lcd = lcd
         self.__lcd.Init()
         self.__frame = None  # Frame gen by current controlled end
         self.__signal = False
+        self.__loop = asyncio.new_event_loop()
+        self.__events = asyncio.Queue()
+        self.__firstFrame = asyncio.Event()
+        self.__widgets = {}
+        self.__deferred = {}  # Button: id of the view its press action waits for a short release on
+        self.__lastInput = time.monotonic()
+        self.__idle = False
+        # Rotary encoder detents not handed on yet and the times of the detents of the current turn
+        self.__turn = {'ticks': 0, 'direction': 0, 'times': collections.deque(maxlen=8), 'busy': False}
+        inputConfig = self.__config['input']
+        self.__gestures = GestureEngine(
+            self.__loop,
+            self.__gesture,
+            repeatable=REPEATABLE,
+            debounce=inputConfig['debounce'],
+            holdTime=inputConfig['hold_time'],
+            repeatDelay=inputConfig['repeat_delay'],
+            repeatInterval=inputConfig['repeat_interval'],
+            repeatMinimum=inputConfig['repeat_minimum'],
+            repeatAcceleration=inputConfig['repeat_acceleration']
+        )
 
         for i in self.__controlledEndList:
             i.irq(self.__irq)
             # Assign UniversalControl.__msgSender to controlledEnd
             i.msgSender(self.__msgSender)
+            self.__widgets[i.id] = controlledEnd.ControlledEndAdapter(i, self.__loop)
 
         self.__gpioInit()
 
         self.__w = frameDecorator.Warining()
-        self.__frameList = multiprocessing.Queue(maxsize=1)
+        self.__notice = None  # Text drawn over every frame, like the profiling progress
+        self.__toast = None
+        self.__profile = None
+        # Deadline and id of the latest profiling session, shared with the display process
+        self.__profileRequest = multiprocessing.RawArray('d', 2)
+        # Start and end of the first frame sent to the panel, written by the display process
+        self.__firstShown = multiprocessing.RawArray('d', 2)
+        # Backlight level asked for, applied by the display process that owns the panel
+        self.__backlight = multiprocessing.RawValue('d', 1.0)
+        # Camera previews are the largest frames, twice the screen size
+        self.__frameBuffer = SharedFrameBuffer(
+            self.__config['screen']['width'] * 2,
+            self.__config['screen']['height'] * 2
+        )
         self.__t = multiprocessing.Process(
-            target=self.showImageInAnotherProcess, args=(self.__frameList,))
+            target=self.showImageInAnotherProcess, args=(self.__frameBuffer,))
         self.__logger.info("UniversalControl initialized")
 
+    @tracer.traced('UniversalControl.__gpioInit')
     def __gpioInit(self):
-        self.__shutter = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['shutter']
-        )
-        self.__shutter.when_activated = self.__shutterPressAction
-
-        self.__square = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['square']
-        )
-        self.__square.when_activated = self.__squarePressAction
-
-        self.__cross = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['cross']
+        pins = self.__config['pin']
+        self.__devices = {}
+        for button, (pin, *_) in BUTTONS.items():
+            device = gpiozero.DigitalInputDevice(pin=pins[pin])
+            # gpiozero calls these on its own threads, they only queue the edge. Plain
+            # functions, gpiozero inspects the signature and cannot handle partials
+            device.when_activated = lambda button=button: self.__edge(button, True)
+            device.when_deactivated = lambda button=button: self.__edge(button, False)
+            self.__devices[button] = device
+        self.__devices['rotaryEncoder'] = gpiozero.RotaryEncoder(
+            pins['rotaryEncoder1A'],
+            pins['rotaryEncoder1B']
         )
-        self.__cross.when_activated = self.__crossPressAction
+        self.__devices['rotaryEncoder'].when_rotated_clockwise = lambda: self.__post('rotate', 1, time.monotonic())
+        self.__devices['rotaryEncoder'].when_rotated_counter_clockwise = \
+            lambda: self.__post('rotate', -1, time.monotonic())
 
-        self.__circle = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['circle']
-        )
-        self.__circle.when_activated = self.__circlePressAction
-
-        self.__up = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['up']
-        )
-        self.__up.when_activated = self.__upPressAction
-        self.__up.when_deactivated = self.__upReleaseAction
+    def __edge(self, button, pressed):
+        self.__post('edge', button, pressed, time.monotonic())
 
-        self.__down = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['down']
-        )
-        self.__down.when_activated = self.__downPressAction
-        self.__down.when_deactivated = self.__downReleaseAction
+    def __post(self, *event):
+        self.__loop.call_soon_threadsafe(self.__events.put_nowait, event)
 
-        self.__left = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['left']
-        )
-        self.__left.when_activated = self.__leftPressAction
-        self.__left.when_deactivated = self.__leftReleaseAction
-
-        self.__right = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['right']
-        )
-        self.__right.when_activated = self.__rightPressAction
-        self.__right.when_deactivated = self.__rightReleaseAction
-
-        self.__center = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['center']
-        )
-        self.__center.when_activated = self.__centerPressAction
-        self.__center.when_deactivated = self.__centerReleaseAction
-
-        self.__rotaryEncoderSelect = gpiozero.DigitalInputDevice(
-            pin=self.__config['pin']['rotaryEncoder1S']
-        )
-        self.__rotaryEncoderSelect.when_activated = self.__rotaryEncoderSelectAction
+    async def __dispatch(self):
+        while True:
+            kind, *args = await self.__events.get()
+            try:
+                if kind in ('edge', 'rotate', 'switch'):
+                    self.__activity()
+                if kind == 'edge':
+                    self.__gestures.edge(*args)
+                elif kind == 'rotate':
+                    self.__rotate(*args)
+                elif kind == 'switch':
+                    self.__switch(*args)
+                elif kind == 'message':
+                    self.__deliver(*args)
+            except LookupError:
+                self.__logger.exception("No controlled end for {}".format(args))
+
+    def __activity(self):
+        """Note input, the first one after the idle timeout wakes the shown view before it is handled"""
+        self.__lastInput = time.monotonic()
+        if self.__idle:
+            self.__idle = False
+            self.__logger.debug("Wake")
+            self.__backlight.value = 1.0
+            self.__widgets[self.__active].post('onWake')
+            self.__widgets[self.__active].invalidate()
+
+    async def __idleWatch(self):
+        """
+        Task telling the shown view and the display process when no input came for idle.after
+        seconds, the view slows down and the backlight dims until the next input
+        """
+        idleConfig = self.__config['idle']
+        if not idleConfig['after']:
+            return
+        while True:
+            remaining = self.__lastInput + idleConfig['after'] - time.monotonic()
+            await asyncio.sleep(1.0 if self.__idle else max(0.1, remaining))
+            if self.__idle or time.monotonic() - self.__lastInput < idleConfig['after']:
+                continue
+            self.__idle = True
+            self.__logger.debug("Idle")
+            self.__backlight.value = idleConfig['backlight']
+            widget = self.__widgets[self.__active]
+            widget.post('onIdle')
+            # A rate limited view may not draw again on its own, the display process applies the backlight with a frame
+            widget.invalidate()
+
+    def __gesture(self, gesture, button):
+        """
+        Map a gesture to the handlers of the active controlled end. A button with a long press
+        handler the view overrides fires its press action on a short release, so a long press
+        does not trigger both.
+        """
+        self.__logger.debug("{} {}".format(button, gesture))
+        if not self.__enable:
+            return
+        _, press, release, longPress = BUTTONS[button]
+        widget = self.__widgets[self.__active]
+        if gesture == 'press':
+            if longPress and widget.overrides(longPress):
+                self.__deferred[button] = widget.id
+            else:
+                widget.post(press)
+        elif gesture == 'repeat':
+            widget.post(press)
+        elif gesture == 'longPress':
+            if self.__deferred.get(button) == widget.id:
+                widget.post(longPress)
+        else:
+            if gesture == 'shortRelease' and self.__deferred.get(button) == widget.id:
+                widget.post(press)
+            self.__deferred.pop(button, None)
+            if release:
+                widget.post(release)
 
-        self.__rotaryEncoder = gpiozero.RotaryEncoder(
-            self.__config['pin']['rotaryEncoder1A'],
-            self.__config['pin']['rotaryEncoder1B']
-        )
-        self.__rotaryEncoder.when_rotated_clockwise = self.__rotaryEncoderClockwise
-        self.__rotaryEncoder.when_rotated_counter_clockwise = self.__rotaryEncoderCounterClockwise
+    def __rotate(self, direction, timestamp):
+        if not self.__enable:
+            return
+        turn = self.__turn
+        if turn['times'] and (direction != turn['direction'] or timestamp - turn['times'][-1] > ROTARY_PAUSE):
+            turn['times'].clear()
+        turn['direction'] = direction
+        turn['times'].append(timestamp)
+        turn['ticks'] += direction
+        self.__flushTicks()
+
+    def __flushTicks(self, *_):
+        """
+        Hand the pending detents to the active controlled end, unless it is still handling the
+        previous ones, then they are delivered together once it is done.
+        """
+        turn = self.__turn
+        if turn['busy'] or not turn['ticks']:
+            return
+        times = turn['times']
+        speed = (len(times) - 1) / (times[-1] - times[0]) if times[-1] > times[0] else 0.0
+        ticks, turn['ticks'] = turn['ticks'], 0
+        self.__logger.debug("Rotary encoder {} ticks at {:.1f}/s".format(ticks, speed))
+        widget = self.__widgets[self.__active]
+        turn['busy'] = True
+        widget.call('rotaryEncoderRotate', ticks, speed, record=True).add_done_callback(self.__ticksHandled)
+
+    def __ticksHandled(self, _):
+        self.__turn['busy'] = False
+        self.__flushTicks()
 
     def __msgReceiver(self, msg):
+        # Menu items of type msg send (value, options)
+        if isinstance(msg, tuple):
+            msg = msg[0]
         if msg == 'restart':
             subprocess.run(['sudo', 'reboot'])
+        elif msg == 'profile':
+            self.__loop.call_soon_threadsafe(self.__startProfile)
+
+    def __startProfile(self):
+        """
+        Profile the event loop, every controlled end and the display process for the configured
+        time, with tracemalloc on this process. Results go to a profile-<id> directory in the
+        screenshot path.
+        """
+        if self.__profile is not None:
+            return
+        sessionId = int(time.time())
+        seconds = self.__config['profiler']['seconds']
+        self.__profile = profiler.ProfileSession(
+            profiler.sessionDirectory(self.__config['screenshot_path'], sessionId),
+            'main',
+            seconds,
+            top=self.__config['profiler']['top'],
+            traceMemory=True
+        )
+        self.__profile.start()
+        self.__profileRequest[:] = [self.__profile.deadline, sessionId]
+        self.__profile.enableThread()
+        for widget in self.__widgets.values():
+            widget.post(self.__profile.enableThread)
+        self.__logger.info("Profiling for {} s into {}".format(seconds, self.__profile.directory))
+        self.__loop.create_task(self.__profileProgress())
+
+    async def __profileProgress(self):
+        session = self.__profile
+        try:
+            while session.remaining > 0:
+                self.__notice = "Profiling {}s".format(int(session.remaining) + 1)
+                # Rate limited views only redraw on request, keep the countdown moving
+                self.__widgets[self.__active].invalidate()
+                await asyncio.sleep(min(1.0, session.remaining))
+            session.disableThread()
+            for widget in self.__widgets.values():
+                await widget.call(exceptionRecorder()(session.disableThread))
+            self.__notice = "Saving profile"
+            path = await self.__loop.run_in_executor(None, session.finish)
+            self.__logger.info("Profile written to {}".format(path))
+        finally:
+            self.__notice = None
+            self.__profile = None
+            self.__widgets[self.__active].invalidate()
+
+    def __showNotice(self, frame):
+        """A copy of the frame with the notice on it, views may yield the same frame again"""
+        frame = frame.copy()
+        if self.__toast is None or self.__toast[0] != frame.shape[:2]:
+            self.__toast = (frame.shape[:2], frameDecorator.Toast(frame.shape[1], frame.shape[0]))
+        self.__toast[1].setText(self.__notice)
+        self.__toast[1].decorate(frame)
+        return frame
+
+    def __profileDisplay(self, session):
+        """Start or finish profiling the display process as asked by the shared request"""
+        deadline, sessionId = self.__profileRequest
+        now = time.monotonic()
+        if session is None:
+            if now < deadline:
+                session = profiler.ProfileSession(
+                    profiler.sessionDirectory(self.__config['screenshot_path'], sessionId),
+                    'display',
+                    deadline - now,
+                    top=self.__config['profiler']['top']
+                )
+                session.start()
+                session.enableThread()
+        elif now >= session.deadline:
+            session.disableThread()
+            session.finish()
+            session = None
+        return session
 
-    @exceptionRecorder()
     def __irq(self, _id: str):
         """
-        Switch the control right of controlledEnd.
+        Switch the control right of controlledEnd. Callable from any thread, the switch
+        happens on the event loop after the events queued before it.
         """
+        self.__post('switch', _id)
+
+    def __switch(self, _id: str):
         self.__logger.info("Irq to {}".format(_id))
-        # Look up controlled end in list
-        for index, widget in enumerate(self.__controlledEndList):
-            if widget.id == _id:
-                self.__signal = True
-                self.__lastWidget = self.__controlledEndList[self.__rights].id
-                oldRights = self.__rights
-                self.__rights = index
-                self.__controlledEndList[oldRights].onExit()
-                break
-        else:
-            raise LookupError(_id)
+        widget = self.__widgets[_id]
+        old = self.__widgets[self.__active]
+        self.__signal = True
+        self.__lastWidget = old.id
+        self.__active = widget.id
+        old.post('onExit')
+        old.post('inactive')
+        # The frame task may be waiting for this view to refresh
+        old.invalidate()
 
-    @exceptionRecorder()
     def __msgSender(self, sender: str, receiver: str, msg):
         """
-
+        Queue a message, it is delivered in order with the input events and switches.
         """
+        self.__post('message', sender, receiver, msg)
+
+    def __deliver(self, sender: str, receiver: str, msg):
         self.__logger.info("Message from {} to {}".format(sender, receiver))
         self.__logger.debug("Message: {}".format(msg))
         if receiver == 'UniversalControl':
-            self.__msgReceiver(msg)
+            self.__loop.run_in_executor(None, exceptionRecorder()(self.__msgReceiver), msg)
             return
-        for widget in self.__controlledEndList:
-            if widget.id == receiver:
-                widget.msgReceiver(sender, msg)
-                break
-        else:
-            raise LookupError(receiver)
+        widget = self.__widgets[receiver]
+        widget.post('msgReceiver', sender, msg)
 
     @exceptionRecorder()
     def showImageInAnotherThread(self, imgList: list):
@@ -191,127 +443,144 @@ class UniversalControl:
             self.__lcd.showImage(imgList.get(True))
 
     @exceptionRecorder()
-    def showImageInAnotherProcess(self, imgList: multiprocessing.Queue):
+    def showImageInAnotherProcess(self, frameBuffer: SharedFrameBuffer):
+        # The main process stops this one by closing the frame buffer, so the last frame can be cached
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        profile = None
+        backlight = 1.0
         while True:
-            self.__lcd.showImage(imgList.get(True))
-
-    @exceptionRecorder()
-    def __centerPressAction(self):
-        self.__logger.debug("Center press action")
-        if not self.__enable:
-            return
-        self.__controlledEndList[self.__rights].centerPressAction()
-
-    @exceptionRecorder()
-    def __centerReleaseAction(self):
-        self.__logger.debug("Center release action")
-        if not self.__enable:
-            return
-
-        self.__controlledEndList[self.__rights].centerReleaseAction()
-
-    def __circlePressAction(self):
-        self.__logger.debug("Circle action")
-        if not self.__enable:
-            return
-        self.__controlledEndList[self.__rights].circlePressAction()
-
-    @exceptionRecorder()
-    def __squarePressAction(self):
-        self.__logger.debug("Square action")
-        if not self.__enable:
-            return
-
-        self.__controlledEndList[self.__rights].squarePressAction()
-
-    @exceptionRecorder()
-    def __crossPressAction(self):
-        self.__logger.debug("Cross action")
-        if not self.__enable:
-            return
-
-        self.__controlledEndList[self.__rights].crossPressAction()
-
-    def __shutterPressAction(self):
-        self.__logger.debug("Shutter press action")
-        if not self.__enable:
-            return
-
-        self.__controlledEndList[self.__rights].shutterPressAction()
-
-    def __upPressAction(self):
-        self.__logger.debug('Up press action')
-        self.__controlledEndList[self.__rights].upPressAction()
-
-    def __downPressAction(self):
-        self.__logger.debug('Down press action')
-
-        self.__controlledEndList[self.__rights].downPressAction()
-
-    def __rightPressAction(self):
-        self.__logger.debug('Right press action')
-
-        self.__controlledEndList[self.__rights].rightPressAction()
-
-    def __leftPressAction(self):
-        self.__logger.debug('Left press action')
-
-        self.__controlledEndList[self.__rights].leftPressAction()
-
-    def __upReleaseAction(self):
-        self.__logger.debug('Up release action')
-        self.__controlledEndList[self.__rights].upReleaseAction()
-
-    def __downReleaseAction(self):
-        self.__logger.debug('Down release action')
-        self.__controlledEndList[self.__rights].downReleaseAction()
-
-    def __rightReleaseAction(self):
-        self.__logger.debug('Right release action')
-        self.__controlledEndList[self.__rights].rightReleaseAction()
-
-    def __leftReleaseAction(self):
-        self.__logger.debug('Left release action')
-        self.__controlledEndList[self.__rights].leftReleaseAction()
-
-    def __rotaryEncoderSelectAction(self):
-        self.__logger.debug('Rotary encoder select action')
-        if not self.__enable:
-            return
-        self.__controlledEndList[self.__rights].rotaryEncoderSelect()
-
-    def __rotaryEncoderClockwise(self):
-        self.__logger.debug('Rotary encoder clockwise action')
-        if not self.__enable:
-            return
-        self.__controlledEndList[self.__rights].rotaryEncoderClockwise()
-
-    def __rotaryEncoderCounterClockwise(self):
-        self.__logger.debug('Rotary encoder counter clockwise action')
-        if not self.__enable:
-            return
-        self.__controlledEndList[self.__rights].rotaryEncoderCounterClockwise()
+            frame = frameBuffer.read()
+            if frame is None:
+                break
+            profile = self.__profileDisplay(profile)
+            if self.__backlight.value != backlight:
+                backlight = self.__backlight.value
+                self.__lcd.setBrightness(backlight)
+            if frameBuffer.rotation != self.__lcd.rotation:
+                self.__lcd.setRotation(frameBuffer.rotation)
+            if frameBuffer.scroll is not None:
+                self.__lcd.scroll(*frameBuffer.scroll)
+            HANDOFF.observe(time.monotonic() - frameBuffer.timestamp)
+            start = time.monotonic()
+            with SHOW.time():
+                self.__lcd.showImage(frame)
+            if not self.__firstShown[1]:
+                self.__firstShown[:] = [start, time.monotonic()]
+            SHOWN.inc()
+            DROPPED.set(frameBuffer.statistics['dropped'])
+        # The display process owns the panel, let it flush and release it
+        lastFrame = self.__config['screen']['splash']['last_frame_path']
+        if lastFrame:
+            try:
+                self.__lcd.cacheFrame(lastFrame)
+            except OSError:
+                self.__logger.exception("Caching the last frame failed")
+        self.__lcd.moduleExit()
+
+    @property
+    def frameStatistics(self):
+        return self.__frameBuffer.statistics
+
+    async def __frames(self):
+        entered = None
+        while True:
+            widget = self.__widgets[self.__active]
+            # Only a switch enters a controlled end, a main loop that
+            # returned is simply started again
+            if entered is not widget:
+                self.__signal = False
+                # A lazy controlled end is built by its first call, on its own thread
+                await widget.call('active', record=True)
+                await widget.call('onEnter', self.__lastWidget, record=True)
+                entered = widget
+
+            generator = await widget.call('mainLoop')
+            # Not a single next() after a switch, the view went inactive behind it
+            while not self.__signal:
+                self.__frame = await widget.next(generator)
+                if self.__frame is None:
+                    await widget.waitForRefresh()
+                    break
+                if self.__signal:
+                    break
+                while not self.__enable:
+                    await asyncio.sleep(0.1)
+                if self.__notice is not None:
+                    self.__frame = self.__showNotice(self.__frame)
+                self.__frameBuffer.write(self.__frame, widget.widget.rotation, widget.widget.scroll)
+                if not self.__firstFrame.is_set():
+                    tracer.mark('first frame handed off')
+                    self.__firstFrame.set()
+                await widget.waitForRefresh()
+            if self.__signal:
+                entered = None
+            # Let the generator clean up on the thread it ran on
+            widget.post(generator.close)
+
+    async def __buildLazy(self):
+        """
+        Build the lazy controlled ends one after another once the first frame is on its way, so
+        they neither delay it nor compete with each other for the CPU. A view opened earlier is
+        built by its first call instead.
+        """
+        await self.__firstFrame.wait()
+        for widget in self.__widgets.values():
+            if widget.built:
+                continue
+            start = time.monotonic()
+            try:
+                await widget.build()
+            except Exception:
+                self.__logger.exception("Building {} failed".format(widget.id))
+            else:
+                self.__logger.info("Built {} in {:.2f} s".format(widget.id, time.monotonic() - start))
+
+    async def __bootReport(self):
+        """
+        Finish the boot trace once the first frame reached the panel and write the timeline when
+        the boot_trace config or the CAM_BOOT_TRACE environment variable asks for it.
+        """
+        while not self.__firstShown[1]:
+            await asyncio.sleep(0.05)
+        tracer.add('first frame on SPI', *self.__firstShown, thread='display')
+        tracer.finish()
+        self.__logger.info("First frame on the panel {:.2f} s after start".format(
+            self.__firstShown[1] - tracer.origin))
+        if self.__config['boot_trace']['enabled'] or os.environ.get('CAM_BOOT_TRACE'):
+            path = await self.__loop.run_in_executor(
+                None, tracer.report, self.__config['boot_trace']['directory'])
+            self.__logger.info("Boot trace written to {}".format(path))
+
+    async def __run(self):
+        tasks = [self.__loop.create_task(widget.run()) for widget in self.__widgets.values()]
+        tasks.append(self.__loop.create_task(self.__dispatch()))
+        tasks.append(self.__loop.create_task(self.__buildLazy()))
+        tasks.append(self.__loop.create_task(self.__bootReport()))
+        tasks.append(self.__loop.create_task(self.__idleWatch()))
+        try:
+            await self.__frames()
+        finally:
+            for task in tasks:
+                task.cancel()
 
     @exceptionRecorder()
     def mainLoop(self):
         self.__t.start()
         self.__logger.info("Enter mainloop")
         try:
-            while True:
-
-                self.__controlledEndList[self.__rights].onEnter(
-                    self.__lastWidget
-                )
-
-                for self.__frame in self.__controlledEndList[self.__rights].mainLoop():
-                    if self.__signal:
-                        self.__signal = False
-                        break
-                    while not self.__enable:
-                        time.sleep(0.1)
-                    self.__frameList.put(self.__frame, True)
+            self.__loop.run_until_complete(self.__run())
         except KeyboardInterrupt:
             self.__logger.info('Stop')
+            self.__gestures.cancel()
+            self.__logger.info('Frames {}'.format(self.frameStatistics))
+            if self.__config['metrics']['snapshot_path']:
+                metrics.registry.dump(self.__config['metrics']['snapshot_path'])
+            for widget in self.__widgets.values():
+                widget.close()
+            self.__frameBuffer.close()
+            self.__t.join(1)
             self.__t.terminate()
+            self.__frameBuffer.release()
             self.__lcd.backlight(False)
             exit(0)
@@ -1,4 +1,27 @@
-from .effect import Hdr
+import importlib
+
+from .bootTrace import BootTrace
 from .exceptionRecorder import exceptionRecorder
+from .gesture import GestureEngine
 from .initialize_logger import initialize_logger
+from .metrics import Registry
+from .profiler import ProfileSession
 from .slidingWindowFilter import SlidingWindowFilter
+
+# These pull in OpenCV and numpy, imported on first access so the boot trace can time those imports
+_LAZY = {
+    'Hdr': '.effect',
+    'SharedFrameBuffer': '.sharedFrameBuffer',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
@@ -0,0 +1,145 @@
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+
+
+def processAge():
+    """Seconds since the interpreter process started, from /proc on Linux, 0 elsewhere"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, which may contain spaces, start with the state, field 3
+            starttime = int(f.read().rsplit(')', 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - starttime / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError, AttributeError):
+        return 0.0
+
+
+class BootTrace:
+    """
+    Timeline of the startup, from the interpreter start to the first frame on the panel.
+
+    Events are taken with time.monotonic(), which is shared by all processes and does not jump when
+    the clock is set during boot, and turned into wall-clock time with one reading taken at creation.
+    Recording is a list append, it runs on every boot and only report() writes anything, after
+    finish() the instrumented functions run untraced.
+
+    Attributes:
+        origin (float): time.monotonic() the interpreter process started at.
+        recording (bool): Whether events are still recorded.
+
+    Methods:
+        mark(name, timestamp=None): Record an instant event.
+        add(name, start, end, thread=None): Record a span measured elsewhere, in another process for instance.
+        span(name): Context manager recording the time spent inside it.
+        traced(name): Decorator recording every call while recording.
+        importModules(names): Import modules one by one, each in a span of its own.
+        finish(): Stop recording.
+        report(directory): Write boot-<time>.txt and the Chrome trace boot-<time>.json, returns the text path.
+    """
+
+    def __init__(self):
+        self.__wall = time.time()
+        self.__monotonic = time.monotonic()
+        self.origin = self.__monotonic - processAge()
+        self.recording = True
+        self.__events = []
+        self.__lock = threading.Lock()
+        self.__events.append(('interpreter start', self.origin, None, 'MainThread'))
+
+    def mark(self, name, timestamp=None):
+        if self.recording:
+            self.__record(name, time.monotonic() if timestamp is None else timestamp, None, None)
+
+    def add(self, name, start, end, thread=None):
+        if self.recording:
+            self.__record(name, start, end, thread)
+
+    def __record(self, name, start, end, thread):
+        with self.__lock:
+            self.__events.append((name, start, end, thread or threading.current_thread().name))
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def traced(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrap(*args, **kwargs):
+                if not self.recording:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrap
+        return decorator
+
+    def importModules(self, names):
+        for name in names:
+            start = time.monotonic()
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                self.add('import {} failed'.format(name), start, time.monotonic())
+            else:
+                self.add('import ' + name, start, time.monotonic())
+
+    def finish(self):
+        self.recording = False
+
+    def __wallTime(self, timestamp):
+        return self.__wall + timestamp - self.__monotonic
+
+    def report(self, directory):
+        with self.__lock:
+            events = sorted(self.__events, key=lambda event: event[1])
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, 'boot-{}'.format(int(self.__wallTime(self.origin))))
+
+        last = max((end or start) for _, start, end, _ in events)
+        lines = ['Boot trace of {}, {:.3f} s\n'.format(
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.__wallTime(self.origin))), last - self.origin)]
+        lines.append('{:>9}  {:>9}  {:<16}  {}'.format('offset', 'duration', 'thread', 'event'))
+        for name, start, end, thread in events:
+            duration = '' if end is None else '{:.3f} s'.format(end - start)
+            lines.append('{:>7.3f} s  {:>9}  {:<16}  {}'.format(start - self.origin, duration, thread, name))
+        with open(base + '.txt', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        # Chrome trace event format, opens in chrome://tracing and Perfetto
+        threads = {}
+        trace = []
+        for name, start, end, thread in events:
+            tid = threads.setdefault(thread, len(threads) + 1)
+            event = {'name': name, 'pid': 1, 'tid': tid, 'ts': round((start - self.origin) * 1e6)}
+            if end is None:
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=round((end - start) * 1e6))
+            trace.append(event)
+        for thread, tid in threads.items():
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread}})
+        with open(base + '.json', 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms',
+                       'otherData': {'start': self.__wallTime(self.origin)}}, f)
+        return base + '.txt'
+
+
+class _Span:
+    __slots__ = ('__trace', '__name', '__start')
+
+    def __init__(self, trace, name):
+        self.__trace = trace
+        self.__name = name
+
+    def __enter__(self):
+        self.__start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.__trace.add(self.__name, self.__start, time.monotonic())
+        return False
+
+
+tracer = BootTrace()
@@ -0,0 +1,115 @@
+class GestureEngine:
+    """
+    Turns the raw edges of buttons into gestures, without sleeping anywhere.
+
+    Every accepted press emits "press". A button held for holdTime emits "longPress" once. Repeatable
+    buttons keep emitting "repeat" while held, first after repeatDelay, then at an interval that starts at
+    repeatInterval and shrinks by repeatAcceleration per repeat down to repeatMinimum. Letting go emits
+    "shortRelease" when the button was released before holdTime, "release" otherwise. Edges closer than
+    debounce seconds to the last accepted edge of the same button are contact bounce, the button takes the
+    state of the last of them once debounce has passed.
+
+    The engine is not thread safe, edges must be fed in on the thread of the scheduler, usually an
+    asyncio event loop, whose call_later drives the timers.
+
+    Args:
+        scheduler: Object with call_later(delay, callback, *args) returning a handle with cancel(),
+            an asyncio event loop for instance.
+        emit (callable): Called as emit(gesture, button) for every gesture.
+        repeatable (iterable): Buttons that auto-repeat while held.
+        debounce (float): Seconds an edge has to be apart from the last accepted one.
+        holdTime (float): Seconds a button has to be held for a long press.
+        repeatDelay (float): Seconds from press to the first repeat.
+        repeatInterval (float): Seconds between the first repeats.
+        repeatMinimum (float): Shortest interval the repeats accelerate to.
+        repeatAcceleration (float): Factor applied to the interval after each repeat, 1 to repeat steadily.
+
+    Methods:
+        edge(button, pressed, timestamp): Feed an edge, timestamp taken with time.monotonic() when it happened.
+        isHeld(button): Whether the button is currently down.
+        cancel(): Stop all timers, buttons held now will not repeat or long-press any more.
+    """
+
+    def __init__(self, scheduler, emit, repeatable=(), debounce=0.02, holdTime=0.6, repeatDelay=0.4,
+                 repeatInterval=0.2, repeatMinimum=0.04, repeatAcceleration=0.8):
+        self.__scheduler = scheduler
+        self.__emit = emit
+        self.__repeatable = set(repeatable)
+        self.__debounce = debounce
+        self.__holdTime = holdTime
+        self.__repeatDelay = repeatDelay
+        self.__repeatInterval = repeatInterval
+        self.__repeatMinimum = repeatMinimum
+        self.__repeatAcceleration = repeatAcceleration
+        self.__held = {}  # button: {'long': bool, 'hold': handle, 'repeat': handle, 'interval': float}
+        self.__lastEdge = {}
+        self.__settling = {}
+
+    def edge(self, button, pressed, timestamp):
+        early = self.__lastEdge.get(button, float('-inf')) + self.__debounce - timestamp
+        if early > 0:
+            # Settle on the last state seen once the bounce is over, a tap shorter
+            # than debounce must not leave the button held
+            if button not in self.__settling:
+                self.__scheduler.call_later(early, self.__settle, button, timestamp + early)
+            self.__settling[button] = pressed
+            return
+        self.__settling.pop(button, None)
+        self.__apply(button, pressed, timestamp)
+
+    def __settle(self, button, timestamp):
+        if button in self.__settling:
+            self.__apply(button, self.__settling.pop(button), timestamp)
+
+    def __apply(self, button, pressed, timestamp):
+        if pressed == (button in self.__held):
+            return
+        self.__lastEdge[button] = timestamp
+        if pressed:
+            self.__press(button)
+        else:
+            self.__release(button)
+
+    def isHeld(self, button):
+        return button in self.__held
+
+    def cancel(self):
+        for state in self.__held.values():
+            self.__stopTimers(state)
+
+    def __press(self, button):
+        state = {'long': False, 'hold': None, 'repeat': None, 'interval': self.__repeatInterval}
+        self.__held[button] = state
+        state['hold'] = self.__scheduler.call_later(self.__holdTime, self.__longPress, button)
+        if button in self.__repeatable:
+            state['repeat'] = self.__scheduler.call_later(self.__repeatDelay, self.__repeat, button)
+        self.__emit('press', button)
+
+    def __release(self, button):
+        state = self.__held.pop(button)
+        self.__stopTimers(state)
+        self.__emit('release' if state['long'] else 'shortRelease', button)
+
+    def __longPress(self, button):
+        state = self.__held.get(button)
+        if state is None:
+            return
+        state['long'] = True
+        state['hold'] = None
+        self.__emit('longPress', button)
+
+    def __repeat(self, button):
+        state = self.__held.get(button)
+        if state is None:
+            return
+        self.__emit('repeat', button)
+        interval = state['interval']
+        state['interval'] = max(self.__repeatMinimum, interval * self.__repeatAcceleration)
+        state['repeat'] = self.__scheduler.call_later(interval, self.__repeat, button)
+
+    @staticmethod
+    def __stopTimers(state):
+        for timer in ('hold', 'repeat'):
+            if state[timer] is not None:
+                state[timer].cancel()
+                state[timer] = None
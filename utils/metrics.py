@@ -0,0 +1,208 @@
+import bisect
+import json
+import multiprocessing
+import time
+
+# Upper bounds of the latency buckets in seconds, 0.1 ms up to 1.6 s in quarter octaves, about 19 % apart,
+# plus one for anything slower
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** (i / 4) for i in range(57))
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('__histogram', '__start')
+
+    def __init__(self, histogram):
+        self.__histogram = histogram
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.__histogram.observe(time.perf_counter() - self.__start)
+        return False
+
+
+class Counter:
+    """A value that only goes up, like frames shown"""
+
+    def __init__(self, registry, name, values, offset):
+        self.__registry = registry
+        self.name = name
+        self.__values = values
+        self.__offset = offset
+
+    def inc(self, amount=1):
+        if self.__registry.enabled:
+            self.__values[self.__offset] += amount
+
+    @property
+    def value(self):
+        return self.__values[self.__offset]
+
+    def snapshot(self):
+        return {'type': 'counter', 'value': self.value}
+
+
+class Gauge:
+    """A value that is set, like the current frame rate"""
+
+    def __init__(self, registry, name, values, offset):
+        self.__registry = registry
+        self.name = name
+        self.__values = values
+        self.__offset = offset
+
+    def set(self, value):
+        if self.__registry.enabled:
+            self.__values[self.__offset] = value
+
+    @property
+    def value(self):
+        return self.__values[self.__offset]
+
+    def snapshot(self):
+        return {'type': 'gauge', 'value': self.value}
+
+
+class Histogram:
+    """
+    Latencies counted into fixed buckets, percentiles are interpolated within the bucket they fall in.
+
+    Methods:
+        observe(seconds): Count one sample.
+        time(): Context manager observing the time spent inside it.
+        percentile(q): The q quantile in seconds, 0 <= q <= 1, None without samples.
+        count, mean: Number of samples and their average in seconds.
+    """
+
+    def __init__(self, registry, name, values, offset, buckets):
+        self.__registry = registry
+        self.name = name
+        self.__values = values
+        self.__offset = offset
+        self.buckets = buckets
+        # Bucket counts, then the overflow bucket, the sum and the sample count
+        self.__sum = offset + len(buckets) + 1
+        self.__count = offset + len(buckets) + 2
+
+    def observe(self, seconds):
+        if not self.__registry.enabled:
+            return
+        values = self.__values
+        values[self.__offset + bisect.bisect_left(self.buckets, seconds)] += 1
+        values[self.__sum] += seconds
+        values[self.__count] += 1
+
+    def time(self):
+        return _Timer(self) if self.__registry.enabled else _NULL_TIMER
+
+    @property
+    def count(self):
+        return int(self.__values[self.__count])
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.__values[self.__sum] / count if count else None
+
+    def percentile(self, q):
+        counts = self.__values[self.__offset:self.__offset + len(self.buckets) + 1]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            'type': 'histogram',
+            'count': self.count,
+            'mean': self.mean,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99)
+        }
+
+
+class Registry:
+    """
+    Counters, gauges and latency histograms kept in one shared memory array.
+
+    The array is allocated when the registry is created, so metrics declared before the display
+    process is forked are updated and read by both processes. Declare metrics at module level, a
+    metric first declared after the fork lives only in the process that declared it. Updates are
+    plain stores without locking, cheap enough for every frame. While disabled they return at once.
+
+    Args:
+        capacity (int): Number of values the array holds, a histogram takes its bucket count plus 3.
+        enabled (bool): Whether updates are recorded.
+
+    Attributes:
+        enabled (bool): Whether updates are recorded, set before forking to apply to all processes.
+
+    Methods:
+        counter(name), gauge(name), histogram(name, buckets): The metric of that name, created on first use.
+        snapshot(): Every metric as a json serializable dict.
+        dump(path): Write the snapshot to a json file.
+    """
+
+    def __init__(self, capacity=4096, enabled=True):
+        self.enabled = enabled
+        self.__values = multiprocessing.RawArray('d', capacity)
+        self.__used = 0
+        self.__metrics = {}
+
+    def __allocate(self, size):
+        if self.__used + size > len(self.__values):
+            raise MemoryError("metrics registry is full")
+        offset = self.__used
+        self.__used += size
+        return offset
+
+    def __get(self, name, kind, size, *args):
+        metric = self.__metrics.get(name)
+        if metric is None:
+            metric = kind(self, name, self.__values, self.__allocate(size), *args)
+            self.__metrics[name] = metric
+        elif not isinstance(metric, kind):
+            raise TypeError("{} is a {}".format(name, type(metric).__name__))
+        return metric
+
+    def counter(self, name):
+        return self.__get(name, Counter, 1)
+
+    def gauge(self, name):
+        return self.__get(name, Gauge, 1)
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS):
+        return self.__get(name, Histogram, len(buckets) + 3, tuple(buckets))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in sorted(self.__metrics.items())}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({'time': time.time(), 'metrics': self.snapshot()}, f, indent=4)
+
+
+registry = Registry()
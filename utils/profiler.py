@@ -0,0 +1,104 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+def sessionDirectory(root, sessionId):
+    """Where the files of a profiling session go, the same in every process taking part"""
+    return os.path.join(root, 'profile-{}'.format(int(sessionId)))
+
+
+class ProfileSession:
+    """
+    A time-boxed cProfile capture of several threads of one process, optionally with tracemalloc.
+
+    cProfile only sees the thread it was enabled on, so every thread taking part calls enableThread()
+    and disableThread() itself and gets a profile of its own, the profiles are merged by finish().
+    Nothing is installed before start(), a process that never profiles pays nothing.
+
+    Args:
+        directory (str): Directory the files are written to, created by start().
+        name (str): Prefix of the files, <name>.pstats and <name>.txt.
+        seconds (float): Length of the session.
+        top (int): Functions and allocation sites listed in the summary.
+        traceMemory (bool): Trace allocations with tracemalloc, it covers the whole process.
+
+    Attributes:
+        directory (str): Directory the files are written to.
+        deadline (float): time.monotonic() the session ends at.
+
+    Methods:
+        start(): Start the clock and tracemalloc.
+        enableThread(), disableThread(): Profile the calling thread, or stop doing so.
+        remaining: Seconds left.
+        finish(): Stop tracemalloc and write the merged profile and the summary, returns the summary path.
+    """
+
+    def __init__(self, directory, name, seconds, top=30, traceMemory=False):
+        self.directory = directory
+        self.__name = name
+        self.__seconds = seconds
+        self.__top = top
+        self.__traceMemory = traceMemory
+        self.__profiles = {}
+        self.__lock = threading.Lock()
+        self.__memory = None
+        self.deadline = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.__traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.deadline = time.monotonic() + self.__seconds
+
+    @property
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def enableThread(self):
+        profile = cProfile.Profile()
+        with self.__lock:
+            self.__profiles[threading.current_thread().name] = profile
+        profile.enable()
+
+    def disableThread(self):
+        with self.__lock:
+            profile = self.__profiles.get(threading.current_thread().name)
+        if profile is not None:
+            profile.disable()
+
+    def finish(self):
+        if self.__traceMemory and tracemalloc.is_tracing():
+            self.__memory = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        with self.__lock:
+            profiles = dict(self.__profiles)
+            self.__profiles.clear()
+
+        summary = io.StringIO()
+        summary.write('{} profile of {:.1f} s, threads: {}\n\n'.format(
+            self.__name, self.__seconds, ', '.join(sorted(profiles)) or 'none'))
+        if profiles:
+            stats = None
+            for profile in profiles.values():
+                profile.create_stats()
+                if stats is None:
+                    stats = pstats.Stats(profile, stream=summary)
+                else:
+                    stats.add(profile)
+            stats.dump_stats(os.path.join(self.directory, self.__name + '.pstats'))
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.__top)
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(self.__top)
+        if self.__memory is not None:
+            summary.write('Top {} allocation sites\n\n'.format(self.__top))
+            for stat in self.__memory.statistics('lineno')[:self.__top]:
+                summary.write('{}\n'.format(stat))
+
+        path = os.path.join(self.directory, self.__name + '.txt')
+        with open(path, 'w') as f:
+            f.write(summary.getvalue())
+        return path
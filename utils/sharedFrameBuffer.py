@@ -0,0 +1,174 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Layout of the shared state array
+_LATEST = 0  # Slot holding the newest complete frame, -1 if none
+_READING = 1  # Slot currently handed out to the consumer, -1 if none
+_FRESH = 2  # 1 while the latest frame has not been picked up yet
+_CLOSED = 3
+_SEQUENCE = 4  # Sequence number of the latest frame
+_WRITTEN = 5
+_READ = 6
+_DROPPED = 7
+_SLOTS = 8  # Per slot: height, width, channels, sequence, rotation, scroll top, bottom and distance, write time
+_SLOT_FIELDS = 9
+
+
+class SharedFrameBuffer:
+    """
+    A triple buffer in shared memory for handing frames from one producer
+    process to one consumer process with latest-frame-wins semantics.
+
+    The producer copies each frame into a slot the consumer is not using and
+    publishes it, it never waits for the consumer. The consumer always picks
+    up the newest complete frame and reads it in place, without pickling or
+    copying. Frames replaced before the consumer picked them up are counted
+    as dropped.
+
+    Args:
+        width (int): Largest frame width that will be written.
+        height (int): Largest frame height that will be written.
+        channels (int): Largest channel count that will be written.
+        slots (int): Number of slots, at least 3.
+
+    Methods:
+        write(frame, rotation, scroll): Publish a frame with the display rotation it was drawn for and an
+            optional (top, bottom, dy) scroll hint, never blocks on the consumer.
+        read(timeout): Wait for a frame newer than the last one read and return a view of it.
+        rotation: Display rotation of the frame last returned by read().
+        scroll: Scroll hint of the frame last returned by read(), None if there is none.
+        timestamp: time.monotonic() the frame last returned by read() was written at.
+        close(): Wake the consumer and make read() return None from now on.
+        release(): Free the shared memory, called by the creating process.
+        statistics: Written, read and dropped frame counts.
+    """
+
+    def __init__(self, width, height, channels=3, slots=3):
+        if slots < 3:
+            raise ValueError("slots must be at least 3")
+        self.__slotCount = slots
+        self.__slotSize = width * height * channels
+        self.__memory = shared_memory.SharedMemory(
+            create=True, size=self.__slotSize * slots)
+        self.__state = multiprocessing.RawArray(
+            'q', _SLOTS + _SLOT_FIELDS * slots)
+        self.__state[_LATEST] = -1
+        self.__state[_READING] = -1
+        self.__condition = multiprocessing.Condition()
+
+    def __slotView(self, slot):
+        base = _SLOTS + _SLOT_FIELDS * slot
+        height, width, channels = self.__state[base:base + 3]
+        offset = slot * self.__slotSize
+        return np.ndarray(
+            (height, width, channels) if channels > 1 else (height, width),
+            np.uint8,
+            self.__memory.buf,
+            offset
+        )
+
+    def write(self, frame, rotation=0, scroll=None):
+        frame = np.asarray(frame, dtype=np.uint8)
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        if height * width * channels > self.__slotSize:
+            raise ValueError("Frame of shape {} does not fit in the buffer".format(frame.shape))
+
+        with self.__condition:
+            busy = (self.__state[_LATEST], self.__state[_READING])
+        # Neither the latest nor the reading slot, so the consumer cannot touch it
+        slot = next(i for i in range(self.__slotCount) if i not in busy)
+
+        base = _SLOTS + _SLOT_FIELDS * slot
+        self.__state[base:base + 3] = [height, width, channels]
+        self.__state[base + 4] = rotation
+        self.__state[base + 5:base + 8] = list(scroll) if scroll else [0, 0, 0]
+        view = self.__slotView(slot)
+        np.copyto(view, frame.reshape(view.shape))
+
+        with self.__condition:
+            if self.__state[_FRESH]:
+                self.__state[_DROPPED] += 1
+                # The consumer never saw the dropped frame, carry its scroll over
+                dropped = _SLOTS + _SLOT_FIELDS * self.__state[_LATEST]
+                if self.__state[dropped + 7] and self.__state[dropped + 5:dropped + 7] == self.__state[base + 5:base + 7]:
+                    self.__state[base + 7] += self.__state[dropped + 7]
+            self.__state[_SEQUENCE] += 1
+            self.__state[base + 3] = self.__state[_SEQUENCE]
+            self.__state[base + 8] = time.monotonic_ns()
+            self.__state[_LATEST] = slot
+            self.__state[_FRESH] = 1
+            self.__state[_WRITTEN] += 1
+            self.__condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Returns a view of the newest frame, valid until the next call to read().
+        When no new frame arrives within timeout the previous frame is returned
+        again, or None if there is none. Returns None once the buffer is closed.
+        """
+        with self.__condition:
+            ready = self.__condition.wait_for(
+                lambda: self.__state[_FRESH] or self.__state[_CLOSED],
+                timeout
+            )
+            if self.__state[_CLOSED]:
+                return None
+            if not ready:
+                if self.__state[_READING] < 0:
+                    return None
+                # Its content already moved once
+                self.__state[_SLOTS + _SLOT_FIELDS * self.__state[_READING] + 7] = 0
+            else:
+                self.__state[_READING] = self.__state[_LATEST]
+                self.__state[_FRESH] = 0
+            self.__state[_READ] += 1
+            slot = self.__state[_READING]
+        return self.__slotView(slot)
+
+    @property
+    def rotation(self):
+        slot = self.__state[_READING]
+        if slot < 0:
+            return 0
+        return self.__state[_SLOTS + _SLOT_FIELDS * slot + 4]
+
+    @property
+    def scroll(self):
+        slot = self.__state[_READING]
+        if slot < 0:
+            return None
+        base = _SLOTS + _SLOT_FIELDS * slot
+        top, bottom, dy = self.__state[base + 5:base + 8]
+        return (top, bottom, dy) if dy else None
+
+    @property
+    def timestamp(self):
+        slot = self.__state[_READING]
+        if slot < 0:
+            return None
+        return self.__state[_SLOTS + _SLOT_FIELDS * slot + 8] / 1e9
+
+    @property
+    def sequence(self):
+        return self.__state[_SEQUENCE]
+
+    @property
+    def statistics(self):
+        return {
+            'written': self.__state[_WRITTEN],
+            'read': self.__state[_READ],
+            'dropped': self.__state[_DROPPED]
+        }
+
+    def close(self):
+        with self.__condition:
+            self.__state[_CLOSED] = 1
+            self.__condition.notify_all()
+
+    def release(self):
+        self.__memory.close()
+        self.__memory.unlink()